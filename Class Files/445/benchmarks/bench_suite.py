@@ -0,0 +1,179 @@
+'''
+bench_suite.py
+Standard performance scenarios for the simulators, checked against a
+stored baseline: light and heavy traffic M/M/1 on the driver-7-end.py
+SSES event loop, the ed.txt emergency department in GPT2.py, a long
+horizon ED run and many short ED replications. Every scenario runs in a
+process of its own, best wall time of a few repeats, and records events
+per second, wall time and peak RSS. A scenario more than tolerance slower
+in events per second, or bigger in peak RSS, than the baseline fails the
+run with exit status 1. Baselines are only comparable on the machine that
+wrote them, --save writes one.
+usage: python3 bench_suite.py [--list] [--only name ...] [--repeats n] [--tolerance f] [--baseline file] [--save]
+'''
+import argparse
+import json
+import os
+import platform
+import subprocess
+import sys
+import time
+
+try:
+    import resource
+except ImportError:
+    # no getrusage on Windows, peak RSS is not recorded there
+    resource = None
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, "../simlib"))
+sys.path.insert(0, os.path.join(HERE, "../hw1-py"))
+sys.path.insert(0, os.path.join(HERE, "../hw2/src"))
+
+from GPT2 import EmergencyDepartmentSimulation
+from sses_batch import load_driver, run_events
+
+ED_CONFIG = os.path.join(HERE, "../hw2/ed.txt")
+BASELINE = os.path.join(HERE, "baseline.json")
+WEEK = 10080
+
+SSES = load_driver().SSES
+
+
+def mm1(rho, customers):
+    """SSES event loop at utilization rho, events handled"""
+    service_mean = 1.0
+    ia_mean = service_mean / rho
+    sses = run_events(SSES(ia_mean, service_mean, customers * ia_mean))
+    return sses.number_arrived + sses.number_departed
+
+
+def ed(weeks, replication=0):
+    """one ed.txt run over weeks, events handled"""
+    simulation = EmergencyDepartmentSimulation(ED_CONFIG, seed=1,
+                                               replication=replication)
+    simulation.simulation_end_time = weeks * WEEK
+    simulation.run(verbose=False)
+    return simulation.events_processed
+
+
+def ed_replications(n):
+    """n one week ed.txt replications one after another, events handled"""
+    return sum(ed(1, replication) for replication in range(n))
+
+
+# name -> (description, function returning the number of events handled)
+SCENARIOS = {
+    "mm1_light": ("M/M/1 rho 0.5, 200k customers",
+                  lambda: mm1(0.5, 200000)),
+    "mm1_heavy": ("M/M/1 rho 0.95, 200k customers",
+                  lambda: mm1(0.95, 200000)),
+    "ed": ("ed.txt, 10 weeks", lambda: ed(10)),
+    "ed_long": ("ed.txt, 100 weeks", lambda: ed(100)),
+    "ed_replications": ("ed.txt, 50 replications of a week",
+                        lambda: ed_replications(50)),
+}
+
+
+def peak_rss_mb():
+    """peak resident set size of this process, None where unknown"""
+    if resource is None:
+        return None
+    peak = resource.getrusage(resource.RUSAGE_SELF).ru_maxrss
+    # kilobytes on Linux, bytes on macOS
+    return peak / (1 << 20) if sys.platform == "darwin" else peak / 1024
+
+
+def measure(name, repeats):
+    """runs one scenario here, best wall time of repeats"""
+    run = SCENARIOS[name][1]
+    best = float("inf")
+    for _ in range(repeats):
+        start = time.perf_counter()
+        events = run()
+        best = min(best, time.perf_counter() - start)
+    return {"events": events,
+            "wall_seconds": best,
+            "events_per_second": events / best,
+            "peak_rss_mb": peak_rss_mb()}
+
+
+def measure_apart(name, repeats):
+    """runs one scenario in a fresh process, so its peak RSS is its own"""
+    done = subprocess.run([sys.executable, os.path.abspath(__file__),
+                           "--measure", name, "--repeats", str(repeats)],
+                          capture_output=True, text=True, check=True)
+    return json.loads(done.stdout)
+
+
+def regressions(current, baseline, tolerance):
+    """what got worse than tolerance allows against the baseline"""
+    found = []
+    if current["events_per_second"] < baseline["events_per_second"] * (1 - tolerance):
+        found.append("events/s")
+    if (current["peak_rss_mb"] is not None and baseline.get("peak_rss_mb")
+            and current["peak_rss_mb"] > baseline["peak_rss_mb"] * (1 + tolerance)):
+        found.append("peak RSS")
+    return found
+
+
+def change(current, before):
+    return f"{(current / before - 1):+7.1%}" if before else "      -"
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Benchmark the simulators against a stored baseline.")
+    parser.add_argument("--list", action="store_true", help="list the scenarios and stop")
+    parser.add_argument("--only", nargs="+", choices=list(SCENARIOS), help="scenarios to run, all by default")
+    parser.add_argument("--repeats", type=int, default=3, help="runs per scenario, the fastest counts")
+    parser.add_argument("--tolerance", type=float, default=0.25, help="allowed slowdown or growth, 0.25 is 25%%")
+    parser.add_argument("--baseline", default=BASELINE, help="baseline file to compare against or --save to")
+    parser.add_argument("--save", action="store_true", help="write the results as the new baseline")
+    parser.add_argument("--measure", help=argparse.SUPPRESS)
+    args = parser.parse_args()
+
+    if args.list:
+        for name, (description, _) in SCENARIOS.items():
+            print(f"{name:<16} {description}")
+        sys.exit(0)
+    if args.measure:
+        print(json.dumps(measure(args.measure, args.repeats)))
+        sys.exit(0)
+
+    baseline = {}
+    if os.path.exists(args.baseline) and not args.save:
+        with open(args.baseline) as f:
+            baseline = json.load(f)["scenarios"]
+
+    results = {}
+    failed = []
+    print(f"{'scenario':<16} {'events/s':>12} {'wall s':>8} {'RSS MB':>8}   vs baseline")
+    for name in args.only or SCENARIOS:
+        current = measure_apart(name, args.repeats)
+        results[name] = current
+        rss = current["peak_rss_mb"]
+        line = (f"{name:<16} {current['events_per_second']:12,.0f} "
+                f"{current['wall_seconds']:8.3f} "
+                f"{rss if rss is not None else float('nan'):8.1f}")
+        if name in baseline:
+            before = baseline[name]
+            worse = regressions(current, before, args.tolerance)
+            line += (f"   events/s {change(current['events_per_second'], before['events_per_second'])}"
+                     f"  RSS {change(rss or 0, before.get('peak_rss_mb'))}"
+                     f"  {'REGRESSION ' + ', '.join(worse) if worse else 'ok'}")
+            if worse:
+                failed.append(name)
+        elif baseline:
+            line += "   not in baseline"
+        print(line)
+
+    if args.save:
+        with open(args.baseline, "w") as f:
+            json.dump({"python": platform.python_version(),
+                       "machine": platform.machine(),
+                       "scenarios": results}, f, indent=2)
+            f.write("\n")
+        print(f"baseline written to {args.baseline}")
+    if failed:
+        print(f"{len(failed)} scenario(s) regressed beyond {args.tolerance:.0%}: {', '.join(failed)}")
+        sys.exit(1)
@@ -0,0 +1,49 @@
+'''
+Cody Nelson
+bench_queue.py
+Times the driver-7-end.py event loop as rho goes to 0.99 with the waiting
+line on a deque and on the old list with pop(0). The deque should hold a
+flat cost per event while the list cost climbs with the queue length
+(rho 1.0 and 1.1 are included to push the line into the tens of thousands).
+usage: python3 bench_queue.py [customers]
+'''
+import sys
+import time
+
+from sses_batch import load_driver, run_events
+
+
+class ListQueue(list):
+    """the original list waiting line, pop(0) on every departure"""
+    def popleft(self):
+        return self.pop(0)
+
+
+def time_run(SSES, rho, customers, queue=None):
+    """ns per event and the time average queue length for one run"""
+    serviceMean = 1.0
+    iaMean = serviceMean / rho
+    sses = SSES(iaMean, serviceMean, customers * iaMean)
+    if queue is not None:
+        sses.arrival_times = queue
+    start = time.perf_counter()
+    run_events(sses)
+    elapsed = time.perf_counter() - start
+    # an arrival and a departure per customer
+    events = 2 * sses.number_delayed
+    return elapsed * 1e9 / max(events, 1), sses.q_size_area / sses.sim_clock
+
+
+if __name__ == '__main__':
+    customers = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    SSES = load_driver().SSES
+
+    print(f"{customers} customers per run")
+    print(f"{'rho':>6} {'avg queue':>10} {'deque ns/event':>15} "
+          f"{'list ns/event':>14}")
+    # past 0.99 the line grows without bound, which is where pop(0) hurts
+    for rho in (0.5, 0.8, 0.9, 0.95, 0.99, 1.0, 1.1):
+        deque_ns, avg_queue = time_run(SSES, rho, customers)
+        list_ns, _ = time_run(SSES, rho, customers, ListQueue())
+        print(f"{rho:>6} {avg_queue:>10.1f} {deque_ns:>15.0f} "
+              f"{list_ns:>14.0f}")
@@ -1,3 +1,5 @@
+from collections import deque
+
 class SSES():
     def __init__(self):
         # predefined inter-arrival and service times
@@ -12,7 +14,7 @@ class SSES():
         self.server_state = self.SERVER_IDLE
 
         self.time_last_event = 0.0
-        self.arrival_times = list()
+        self.arrival_times = deque()
 
         # the event list holds times for next arrival and departure events
         # the event list should only have as many entries as there are events
@@ -42,7 +44,7 @@ class SSES():
         print("event_list[EVENT_DEPARTURE]: "
               + str(self.event_list[self.EVENT_DEPARTURE]))
         print("arrival_times[]: ", end="")
-        print(self.arrival_times)
+        print(list(self.arrival_times))
         print("number delayed: " + str(self.number_delayed))
         print("total delay time: " + str(self.total_delay_time))
         avg_delay = 0.0
@@ -80,7 +82,7 @@ class SSES():
     def departure(self):
         """processes a departure event based on queue size"""
         if len(self.arrival_times) > 0:
-            cust_arrival_time = self.arrival_times.pop(0)
+            cust_arrival_time = self.arrival_times.popleft()
             self.event_list[self.EVENT_DEPARTURE] = (
                     self.sim_clock + self.service[self.service_index])
             self.service_index += 1
@@ -3,6 +3,8 @@ Cody Nelson
 driver-5-util.py
 Shows the overall utilization time over the lifetime of the program
 '''
+from collections import deque
+
 class SSES():
     def __init__(self):
         # predefined inter-arrival and service times
@@ -18,7 +20,7 @@ class SSES():
         self.time_active = 0.0
 
         self.time_last_event = 0.0
-        self.arrival_times = list()
+        self.arrival_times = deque()
 
         # the event list holds times for next arrival and departure events
         # the event list should only have as many entries as there are events
@@ -49,7 +51,7 @@ class SSES():
         print("event_list[EVENT_DEPARTURE]: "
               + str(self.event_list[self.EVENT_DEPARTURE]))
         print("arrival_times[]: ", end="")
-        print(self.arrival_times)
+        print(list(self.arrival_times))
         print("number delayed: " + str(self.number_delayed))
         print("total delay time: " + str(self.total_delay_time))
         avg_delay = 0.0
@@ -108,7 +110,7 @@ class SSES():
         time_interval = self.sim_clock - self.time_last_event
 
         if len(self.arrival_times) > 0:
-            cust_arrival_time = self.arrival_times.pop(0)
+            cust_arrival_time = self.arrival_times.popleft()
             self.event_list[self.EVENT_DEPARTURE] = (
                     self.sim_clock + self.service[self.service_index])
             self.service_index += 1
@@ -5,6 +5,7 @@ replaces the old list system with a random number generator
 '''
 import random
 import sys
+from collections import deque
 
 class SSES():
     def __init__(self, iaMean, service_mean, end_sim):
@@ -28,7 +29,7 @@ class SSES():
         self.time_active = 0.0
 
         self.time_last_event = 0.0
-        self.arrival_times = list()
+        self.arrival_times = deque()
 
         # the event list holds times for next arrival and departure events
         # the event list should only have as many entries as there are events
@@ -65,7 +66,7 @@ class SSES():
         print("event_list[EVENT_DEPARTURE]: "
               + str(self.event_list[self.EVENT_DEPARTURE]))
         print("arrival_times[]: ", end="")
-        print(self.arrival_times)
+        print(list(self.arrival_times))
         print("number delayed: " + str(self.number_delayed))
         print("total delay time: " + str(self.total_delay_time))
         avg_delay = 0.0
@@ -122,7 +123,7 @@ class SSES():
         time_interval = self.sim_clock - self.time_last_event
 
         if len(self.arrival_times) > 0:
-            cust_arrival_time = self.arrival_times.pop(0)
+            cust_arrival_time = self.arrival_times.popleft()
             self.event_list[self.EVENT_DEPARTURE] = (
                     self.sim_clock + self.serviceRandom())
             self.number_delayed += 1
@@ -3,19 +3,30 @@ Cody Nelson
 driver-7-end.py
 Ends the program based on the 3rd command line arguement
 '''
-import random
+import os
 import sys
+from collections import deque
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../simlib"))
+
+from eventlist import EventList
+from rng import BufferedStream, mt19937_stream
+from tracing import Tracer, LEVELS, SUMMARY, EVENT
+from eventtrace import ARRIVE, START, DEPART
 
 class SSES():
-    def __init__(self, iaMean, service_mean, end_sim):
-        # predefined inter-arrival and service times
-        iaseed = 1
-        serviceseed = 2
-        self.iaRand = random.Random(iaseed)
-        self.serviceRand = random.Random(serviceseed)
+    def __init__(self, iaMean, service_mean, end_sim, iaseed=1, serviceseed=2,
+                 trace=None, antithetic=False):
+        # inter-arrival and service times, drawn in blocks from the
+        # same Mersenne Twister streams as random.Random(seed), or from
+        # 1 - u of them for the antithetic run of a pair
+        self.iaRand = BufferedStream(mt19937_stream(iaseed),
+                                     antithetic=antithetic)
+        self.serviceRand = BufferedStream(mt19937_stream(serviceseed),
+                                          antithetic=antithetic)
         self.iaMean = iaMean
         self.serviceMean = service_mean
-
+        self.end_sim = end_sim
 
         self.sim_clock = 0.0
         self.SERVER_IDLE = 0
@@ -24,10 +35,13 @@ class SSES():
         self.time_active = 0.0
 
         self.time_last_event = 0.0
-        self.arrival_times = list()
+        self.arrival_times = deque()
+
+        # the future event list decides which event happens next
+        self.events = EventList()
 
         # the event list holds times for next arrival and departure events
-        # the event list should only have as many entries as there are events
+        # for interim_report, the ordering comes from self.events
         self.event_list = list()
 
         # index in event_list for arrival events
@@ -43,37 +57,61 @@ class SSES():
         # set the departure time so that arrival occurs before departure
         self.event_list.append(float('inf'))
         self.event_list.append(end_sim)
+        self.schedule_arrival(self.event_list[self.EVENT_ARRIVAL])
 
         self.number_delayed = 0
         self.total_delay_time = 0.0
         self.q_size_area = 0.0
 
+        # optional eventtrace.TraceWriter, customers are numbered by arrival
+        self.trace = trace
+        self.number_arrived = 0
+        self.number_departed = 0
+
     def iaRandom(self):
-        return self.iaRand.expovariate(1/self.iaMean)
+        return self.iaRand.exponential(self.iaMean)
     
     def serviceRandom(self):
-        return self.serviceRand.expovariate(1/self.serviceMean)
+        return self.serviceRand.exponential(self.serviceMean)
+
+    def controls(self):
+        """inter-arrival and service control variates, expectation 0 each"""
+        return {"arrivals": self.iaRand.exponential_mean() - 1,
+                "service": self.serviceRand.exponential_mean() - 1}
     
     def __str__():
         f"Single Server Event Simulation"
 
-    def interim_report(self):
-        """prints variables of interest"""
-        print("server state: " + str(self.server_state))
-        print("sim clock: " + str(self.sim_clock))
+    def schedule_arrival(self, arrival_time):
+        """schedules the next arrival, or the end once arrivals pass end_sim"""
+        self.event_list[self.EVENT_ARRIVAL] = arrival_time
+        if arrival_time > self.end_sim:
+            # the run stops as soon as the next arrival lands past end_sim
+            self.events.schedule(self.sim_clock, self.EVENT_END)
+        else:
+            self.events.schedule(arrival_time, self.EVENT_ARRIVAL)
+
+    def schedule_departure(self, departure_time):
+        self.event_list[self.EVENT_DEPARTURE] = departure_time
+        self.events.schedule(departure_time, self.EVENT_DEPARTURE)
+
+    def interim_report(self, file=None):
+        """prints variables of interest, to stdout or the given file"""
+        print("server state: " + str(self.server_state), file=file)
+        print("sim clock: " + str(self.sim_clock), file=file)
         print("event_list[EVENT_ARRIVAL]: "
-              + str(self.event_list[self.EVENT_ARRIVAL]))
+              + str(self.event_list[self.EVENT_ARRIVAL]), file=file)
         print("event_list[EVENT_DEPARTURE]: "
-              + str(self.event_list[self.EVENT_DEPARTURE]))
-        print("arrival_times[]: ", end="")
-        print(self.arrival_times)
-        print("number delayed: " + str(self.number_delayed))
-        print("total delay time: " + str(self.total_delay_time))
+              + str(self.event_list[self.EVENT_DEPARTURE]), file=file)
+        print("arrival_times[]: ", end="", file=file)
+        print(list(self.arrival_times), file=file)
+        print("number delayed: " + str(self.number_delayed), file=file)
+        print("total delay time: " + str(self.total_delay_time), file=file)
         avg_delay = 0.0
         if self.number_delayed != 0:
             avg_delay = self.total_delay_time / self.number_delayed
-        print("expected avg delay in queue: " + str(avg_delay))
-        print("q size area: " + str(self.q_size_area))
+        print("expected avg delay in queue: " + str(avg_delay), file=file)
+        print("q size area: " + str(self.q_size_area), file=file)
         avg_queue_size = 0.0
         total_active = 0.0
         if self.sim_clock != 0:
@@ -81,21 +119,13 @@ class SSES():
             total_active = self.time_active / self.sim_clock
             
 
-        print("expected avg queue size: " + str(avg_queue_size))
-        print(f"server utilization: {total_active:.2%}")
-        print("------------------------------------")
+        print("expected avg queue size: " + str(avg_queue_size), file=file)
+        print(f"server utilization: {total_active:.2%}", file=file)
+        print("------------------------------------", file=file)
 
     def timing(self):
         """sets sim clock to time of next event. returns event type"""
-        if (self.event_list[self.EVENT_ARRIVAL] > self.event_list[self.EVENT_END]):
-            retval = self.EVENT_END
-        elif (self.event_list[self.EVENT_ARRIVAL] < self.event_list[self.EVENT_DEPARTURE]):
-            self.sim_clock = self.event_list[self.EVENT_ARRIVAL]
-            retval = self.EVENT_ARRIVAL
-        
-        else:
-            self.sim_clock = self.event_list[self.EVENT_DEPARTURE]
-            retval = self.EVENT_DEPARTURE
+        self.sim_clock, _, retval, _ = self.events.pop()
 
         if self.server_state == self.SERVER_BUSY:
             self.time_active += self.sim_clock - self.time_last_event
@@ -103,16 +133,20 @@ class SSES():
 
     def arrival(self):
         """processes an arrival event based on server status"""
-        self.event_list[self.EVENT_ARRIVAL] = (
-                self.sim_clock + self.iaRandom())
+        self.schedule_arrival(self.sim_clock + self.iaRandom())
         queue_size = len(self.arrival_times)
         time_interval = self.sim_clock - self.time_last_event
 
+        self.number_arrived += 1
+        if self.trace is not None:
+            self.trace.record(self.sim_clock, ARRIVE, 0, self.number_arrived)
+
         if self.server_state == self.SERVER_IDLE:
             self.server_state = self.SERVER_BUSY
-            self.event_list[self.EVENT_DEPARTURE] = (
-                    self.sim_clock + self.serviceRandom())
+            self.schedule_departure(self.sim_clock + self.serviceRandom())
             self.number_delayed += 1
+            if self.trace is not None:
+                self.trace.record(self.sim_clock, START, 0, self.number_delayed)
         else:
             self.arrival_times.append(self.sim_clock)
 
@@ -124,11 +158,16 @@ class SSES():
         queue_size = len(self.arrival_times)
         time_interval = self.sim_clock - self.time_last_event
 
+        self.number_departed += 1
+        if self.trace is not None:
+            self.trace.record(self.sim_clock, DEPART, 0, self.number_departed)
+
         if len(self.arrival_times) > 0:
-            cust_arrival_time = self.arrival_times.pop(0)
-            self.event_list[self.EVENT_DEPARTURE] = (
-                    self.sim_clock + self.serviceRandom())
+            cust_arrival_time = self.arrival_times.popleft()
+            self.schedule_departure(self.sim_clock + self.serviceRandom())
             self.number_delayed += 1
+            if self.trace is not None:
+                self.trace.record(self.sim_clock, START, 0, self.number_delayed)
             delayI = self.sim_clock - cust_arrival_time
             self.total_delay_time += delayI
         else:
@@ -138,32 +177,54 @@ class SSES():
         self.q_size_area += queue_size * time_interval
         self.time_last_event = self.sim_clock
 
-debugmode = 1
-if (debugmode == 0):
-    if len(sys.argv) != 4:
-        print("Command Line Error, 3 arguements required")
-        sys.exit(1)
-    iaArrivalMean = float(sys.argv[1])
-    serviceMean = float(sys.argv[2])
-    endTime = int(sys.argv[3])
-else:
-    iaArrivalMean = 6
-    serviceMean = 2
-    endTime = 15
-
-sses = SSES(iaArrivalMean, serviceMean, endTime)
-sses.interim_report()
-
-while True:
-    event_type = sses.timing()
-    if sses.EVENT_ARRIVAL == event_type:
-        print("^^^^^ ARRIVAL")
-        sses.arrival()
-    elif sses.EVENT_END == event_type:
-        print("Simulation Ended")
-        break
+if __name__ == '__main__':
+    # no arguments runs the small debug case, otherwise the arguments count
+    debugmode = 1 if len(sys.argv) == 1 else 0
+    if (debugmode == 0):
+        if len(sys.argv) < 4 or len(sys.argv) > 7:
+            print("Command Line Error, 3 arguements required "
+                  "[trace level off/summary/event] [every Nth event] "
+                  "[trace file]")
+            sys.exit(1)
+        iaArrivalMean = float(sys.argv[1])
+        serviceMean = float(sys.argv[2])
+        endTime = int(sys.argv[3])
+        level = LEVELS[sys.argv[4]] if len(sys.argv) > 4 else SUMMARY
+        every = int(sys.argv[5]) if len(sys.argv) > 5 else 1
+        path = sys.argv[6] if len(sys.argv) > 6 else None
     else:
-        print("^^^^^ DEPART")
-        sses.departure()
-
-    sses.interim_report()
\ No newline at end of file
+        iaArrivalMean = 6
+        serviceMean = 2
+        endTime = 15
+        level = EVENT
+        every = 1
+        path = None
+
+    tracer = Tracer(level, path, every)
+    EVENT_LABELS = ["^^^^^ ARRIVAL", "^^^^^ DEPART"]
+
+    sses = SSES(iaArrivalMean, serviceMean, endTime)
+    if tracer.per_event:
+        sses.interim_report(file=tracer)
+        tracer.end_record()
+
+    while True:
+        event_type = sses.timing()
+        if sses.EVENT_ARRIVAL == event_type:
+            sses.arrival()
+        elif sses.EVENT_END == event_type:
+            break
+        else:
+            sses.departure()
+
+        # nothing is formatted unless this event is being traced
+        if tracer.per_event and tracer.sample():
+            print(EVENT_LABELS[event_type], file=tracer)
+            sses.interim_report(file=tracer)
+            tracer.end_record()
+
+    if tracer.level >= SUMMARY:
+        print("Simulation Ended", file=tracer)
+        if not tracer.per_event:
+            sses.interim_report(file=tracer)
+    tracer.close()
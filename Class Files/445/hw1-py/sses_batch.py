@@ -0,0 +1,244 @@
+'''
+Cody Nelson
+sses_batch.py
+Batch mode for the single server model in driver-7-end.py. Draws the
+inter-arrival and service times in numpy blocks and walks the queue with
+the Lindley recursion instead of one method call per event.
+usage: python3 sses_batch.py <iaMean> <serviceMean> <endTime> [--instrument <file.json>]
+'''
+import importlib.util
+import os
+import sys
+import time
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../simlib"))
+
+from instrument import Instruments
+from rng import mt19937_stream, standard_exponentials
+
+
+def load_driver(name="driver-7-end.py"):
+    """imports one of the hw1 driver scripts as a module"""
+    path = os.path.join(os.path.dirname(__file__), name)
+    spec = importlib.util.spec_from_file_location(
+        name.replace("-", "_").replace(".py", ""), path)
+    module = importlib.util.module_from_spec(spec)
+    spec.loader.exec_module(module)
+    return module
+
+
+def expo_block(stream, mean, size):
+    """block of exponential draws, the same values SSES.iaRandom() returns"""
+    draws = standard_exponentials(stream.random(size))
+    draws *= mean
+    return draws
+
+
+class BatchSSES():
+    def __init__(self, iaMean, service_mean, end_sim, iaseed=1,
+                 serviceseed=2, chunk_size=1 << 15):
+        # same seeds as SSES so both modes see the same customers
+        self.iaRand = mt19937_stream(iaseed)
+        self.serviceRand = mt19937_stream(serviceseed)
+        self.iaMean = iaMean
+        self.serviceMean = service_mean
+        self.end_sim = end_sim
+        self.chunk_size = chunk_size
+
+        self.sim_clock = 0.0
+        self.number_arrived = 0
+        self.number_delayed = 0
+        self.total_delay_time = 0.0
+        self.q_size_area = 0.0
+        self.time_active = 0.0
+
+    def __str__(self):
+        return "Single Server Batch Simulation"
+
+    def run(self):
+        """runs until the next arrival passes end_sim, like SSES.timing()"""
+        last_arrival = 0.0
+        last_departure = 0.0
+        # customers still waiting or in service at the end of a block
+        pending = (np.empty(0), np.empty(0), np.empty(0))
+        done = False
+
+        while not done:
+            ia = expo_block(self.iaRand, self.iaMean, self.chunk_size)
+            # cumsum adds one inter-arrival at a time, same as sim_clock + ia
+            arrivals = np.cumsum(np.concatenate(([last_arrival], ia)))[1:]
+            if arrivals[-1] > self.end_sim:
+                arrivals = arrivals[arrivals <= self.end_sim]
+                done = True
+            if len(arrivals) == 0:
+                break
+            self.number_arrived += len(arrivals)
+            last_arrival = arrivals[-1]
+
+            service = expo_block(self.serviceRand, self.serviceMean,
+                                 len(arrivals))
+            starts, departures = self.lindley(arrivals, service,
+                                              last_departure)
+            last_departure = departures[-1]
+
+            arrivals = np.concatenate((pending[0], arrivals))
+            starts = np.concatenate((pending[1], starts))
+            departures = np.concatenate((pending[2], departures))
+
+            # anyone out the door before the last arrival is settled for good
+            settled = np.searchsorted(departures, last_arrival, side="right")
+            delays = (starts[:settled] - arrivals[:settled]).sum()
+            self.number_delayed += int(settled)
+            self.total_delay_time += float(delays)
+            self.q_size_area += float(delays)
+            self.time_active += float(
+                (departures[:settled] - starts[:settled]).sum())
+            pending = (arrivals[settled:], starts[settled:],
+                       departures[settled:])
+
+        self.sim_clock = float(last_arrival)
+        self.accumulate(*pending, self.sim_clock)
+        return self
+
+    @staticmethod
+    def lindley(arrivals, service, last_departure):
+        """service start and departure times for one block of customers
+
+        D[n] = max(A[n], D[n-1]) + S[n]. Subtracting the running service
+        total turns the max into a running maximum, so the block is solved
+        with cumsum and maximum.accumulate.
+        """
+        served = np.cumsum(service)
+        before = served - service
+        departures = np.maximum.accumulate(
+            np.maximum(arrivals - before, last_departure)) + served
+        starts = np.maximum(
+            arrivals, np.concatenate(([last_departure], departures[:-1])))
+        return starts, departures
+
+    def accumulate(self, arrivals, starts, departures, clock):
+        """adds customers to the totals, clipped to the time clock"""
+        started = starts <= clock
+        self.number_delayed += int(np.count_nonzero(started))
+        self.total_delay_time += float(
+            (starts[started] - arrivals[started]).sum())
+        self.q_size_area += float((np.minimum(starts, clock) - arrivals).sum())
+        self.time_active += float(
+            (np.minimum(departures, clock) - np.minimum(starts, clock)).sum())
+
+    def report(self):
+        """prints the same summary numbers as SSES.interim_report()"""
+        print("sim clock: " + str(self.sim_clock))
+        print("number delayed: " + str(self.number_delayed))
+        print("total delay time: " + str(self.total_delay_time))
+        avg_delay = 0.0
+        if self.number_delayed != 0:
+            avg_delay = self.total_delay_time / self.number_delayed
+        print("expected avg delay in queue: " + str(avg_delay))
+        print("q size area: " + str(self.q_size_area))
+        avg_queue_size = 0.0
+        total_active = 0.0
+        if self.sim_clock != 0:
+            avg_queue_size = self.q_size_area / self.sim_clock
+            total_active = self.time_active / self.sim_clock
+        print("expected avg queue size: " + str(avg_queue_size))
+        print(f"server utilization: {total_active:.2%}")
+        print("------------------------------------")
+
+
+def run_events(sses, instruments=None):
+    """the driver-7 event loop without the per event printing
+
+    With instruments (an instrument.Instruments) the timed loop runs
+    instead, see run_instrumented.
+    """
+    if instruments is not None:
+        return run_instrumented(sses, instruments)
+    while True:
+        event_type = sses.timing()
+        if sses.EVENT_ARRIVAL == event_type:
+            sses.arrival()
+        elif sses.EVENT_END == event_type:
+            break
+        else:
+            sses.departure()
+    return sses
+
+
+def run_instrumented(sses, instruments):
+    """run_events with every event counted and timed into instruments
+
+    SSES updates its delay and queue statistics inside arrival() and
+    departure(), so that time is booked as handlers, and the busy time
+    kept by timing() as event_list.
+    """
+    instruments.bind(["arrival", "departure", "end"], ["server"])
+    streams = sses.iaRand, sses.serviceRand
+    sses.iaRand = instruments.timed_stream(sses.iaRand)
+    sses.serviceRand = instruments.timed_stream(sses.serviceRand)
+    counts = instruments.events
+    seconds = instruments.seconds
+    clock = time.perf_counter
+    started = clock()
+    try:
+        while True:
+            popped = clock()
+            event_type = sses.timing()
+            handled = clock()
+            seconds["event_list"] += handled - popped
+            counts[event_type] += 1
+            if sses.EVENT_END == event_type:
+                break
+            if sses.EVENT_ARRIVAL == event_type:
+                sses.arrival()
+            else:
+                sses.departure()
+            seconds["handlers"] += clock() - handled
+            if len(sses.events) > instruments.heap_high_water:
+                instruments.heap_high_water = len(sses.events)
+            if len(sses.arrival_times) > instruments.queue_high_water[0]:
+                instruments.queue_high_water[0] = len(sses.arrival_times)
+    finally:
+        sses.iaRand, sses.serviceRand = streams
+        instruments.wall += clock() - started
+    return sses
+
+
+if __name__ == '__main__':
+    instrument_path = None
+    if len(sys.argv) == 6 and sys.argv[4] == "--instrument":
+        instrument_path = sys.argv[5]
+    elif len(sys.argv) != 4:
+        print("Command Line Error, 3 arguements required "
+              "[--instrument file.json]")
+        sys.exit(1)
+    iaArrivalMean = float(sys.argv[1])
+    serviceMean = float(sys.argv[2])
+    endTime = float(sys.argv[3])
+
+    start = time.perf_counter()
+    batch = BatchSSES(iaArrivalMean, serviceMean, endTime).run()
+    batch_time = time.perf_counter() - start
+    batch.report()
+
+    driver = load_driver()
+    start = time.perf_counter()
+    sses = run_events(driver.SSES(iaArrivalMean, serviceMean, endTime))
+    event_time = time.perf_counter() - start
+
+    for name in ("number_delayed", "total_delay_time", "q_size_area",
+                 "time_active"):
+        print(f"{name}: events {getattr(sses, name)} "
+              f"batch {getattr(batch, name)}")
+    print(f"event loop {event_time:.3f}s, batch {batch_time:.3f}s, "
+          f"speedup {event_time / batch_time:.1f}x")
+
+    if instrument_path is not None:
+        # a run of its own, the timers would slow down the one compared above
+        instruments = Instruments()
+        run_events(driver.SSES(iaArrivalMean, serviceMean, endTime),
+                   instruments)
+        instruments.report()
+        instruments.to_json(instrument_path)
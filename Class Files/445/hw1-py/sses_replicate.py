@@ -0,0 +1,92 @@
+'''
+Cody Nelson
+sses_replicate.py
+Independent replications of the driver-7-end.py single server model,
+spread over a process pool, with confidence intervals on the averages.
+With vr the same replications are also reported as antithetic pairs and
+with the inter-arrival and service control variates.
+usage: python3 sses_replicate.py <iaMean> <serviceMean> <endTime> <replications> [vr]
+'''
+import os
+import sys
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../simlib"))
+
+from replications import (replicate, replication_seed, seed_int, summarize,
+                          print_summary)
+from sses_batch import load_driver, run_events
+from variance import antithetic, control_variates, print_reduction
+
+
+def sses_replication(iaMean, serviceMean, endTime, seed, index,
+                     mirrored=False, controls=False):
+    """one event loop run with its own inter-arrival and service streams
+
+    mirrored runs the antithetic image of the replication, controls
+    returns {"results": ..., "controls": ...} instead of the results.
+    """
+    iaseed, serviceseed = (
+        seed_int(s) for s in replication_seed(seed, index).spawn(2))
+    sses = run_events(load_driver().SSES(iaMean, serviceMean, endTime,
+                                         iaseed, serviceseed,
+                                         antithetic=mirrored))
+    avg_delay = 0.0
+    if sses.number_delayed != 0:
+        avg_delay = sses.total_delay_time / sses.number_delayed
+    avg_queue_size = 0.0
+    utilization = 0.0
+    if sses.sim_clock != 0:
+        avg_queue_size = sses.q_size_area / sses.sim_clock
+        utilization = sses.time_active / sses.sim_clock
+    results = {"avg_delay": avg_delay,
+               "avg_queue_size": avg_queue_size,
+               "utilization": utilization}
+    if controls:
+        return {"results": results, "controls": sses.controls()}
+    return results
+
+
+def variance_report(iaMean, serviceMean, endTime, plain):
+    """antithetic pairs and control variates against plain replications
+
+    plain are the replications already run with controls=True.
+    """
+    n = len(plain)
+    mirrored = replicate(partial(sses_replication, iaMean, serviceMean,
+                                 endTime, mirrored=True, controls=True),
+                         n // 2)
+    names = list(plain[0]["results"])
+    rows = []
+    for name in names:
+        rows.append((name, *antithetic(
+            [r["results"][name] for r in plain[:n // 2]],
+            [r["results"][name] for r in mirrored])))
+    print_reduction(f"Antithetic, {n // 2} pairs", rows)
+    cvs = [list(r["controls"].values()) for r in plain]
+    rows = [(name, *control_variates([r["results"][name] for r in plain],
+                                     cvs))
+            for name in names]
+    print_reduction(f"Control variates, {n} replications", rows)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) not in (5, 6):
+        print("Command Line Error, 4 arguements required")
+        sys.exit(1)
+    iaArrivalMean = float(sys.argv[1])
+    serviceMean = float(sys.argv[2])
+    endTime = float(sys.argv[3])
+    n = int(sys.argv[4])
+
+    vr = sys.argv[5:] == ["vr"]
+
+    start = time.perf_counter()
+    runs = replicate(partial(sses_replication, iaArrivalMean, serviceMean,
+                             endTime, controls=vr), n)
+    results = [r["results"] for r in runs] if vr else runs
+    print_summary(summarize(results), n)
+    if vr:
+        variance_report(iaArrivalMean, serviceMean, endTime, runs)
+    print(f"wall time: {time.perf_counter() - start:.2f}s")
@@ -1,92 +1,197 @@
+import os
 import sys
-import random
 import math
-import heapq
-from collections import deque, defaultdict
-
-# Generate exponential random variable
-def exponential(mean):
-    return -mean * math.log(random.random())
-
-# Event class to represent different events
-class Event:
-    def __init__(self, time, event_type, patient_id):
-        self.time = time
-        self.event_type = event_type
-        self.patient_id = patient_id
-
-    def __lt__(self, other):
-        return self.time < other.time
+import pickle
+import time
+import zlib
+from collections import deque
+from contextlib import closing
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../simlib"))
+
+from arrivals import ArrivalProfile
+from disciplines import PriorityLine
+from eventlist import EventList
+from eventtrace import TraceWriter, ARRIVE, START, DEPART
+from instrument import Instruments
+from network import apply_settings, compile_network, load_network, make_sampler
+from resultcache import ResultCache, source_version
+from rng import RandomStreams
+from stats import Tally
+from steady_state import mser5, batch_ratio_means
+
+# Event type codes: an arrival, or station i finishing a service as i + 1
+ARRIVAL = 0
+
+# Stations of an ed.txt style config, in station number order
+AREAS = ['triage', 'trauma', 'acute', 'prompt']
+
+# Hash of the model code and the simlib modules it runs on, cached results
+# from any other version of the code are never returned
+MODEL_VERSION = source_version(__file__, *(sys.modules[name].__file__ for name in ('eventlist', 'rng', 'stats', 'network', 'alias', 'disciplines', 'arrivals')))
+
+# The network an ed.txt style config describes. Arrivals go to triage,
+# which discharges triage_discharge_prob of its patients and sends the rest
+# to trauma with trauma_prob, acute with acute_prob and prompt care the rest
+# of the time. Trauma, acute and prompt patients are acuity 1, 2 and 3.
+def ed_network_spec(config):
+    treated = 1 - config['triage_discharge_prob']
+    trauma = min(config['trauma_prob'], 1.0)
+    # prompt care takes whatever the trauma and acute ranges leave
+    acute = max(0.0, min(config['acute_prob'], 1 - trauma))
+    prompt = max(0.0, 1 - trauma - acute)
+    stations = {
+        'triage': {
+            'servers': int(config['triage_servers']),
+            'service': config['triage_service_mean'],
+            'routing': {'exit': config['triage_discharge_prob'], 'trauma': treated * trauma, 'acute': treated * acute, 'prompt': treated * prompt}
+        }
+    }
+    for acuity, area in enumerate(AREAS[1:], 1):
+        stations[area] = {'servers': int(config[f'{area}_servers']), 'service': config[f'{area}_service_mean'], 'acuity': acuity}
+    return {
+        'end_time': config['simulation_end_time'],
+        'arrivals': {'to': 'triage', 'mean': config['triage_inter_arrival_mean']},
+        'stations': stations
+    }
 
 # Simulation class to manage the simulation process
 class EmergencyDepartmentSimulation:
-    def __init__(self, config_file):
-        self.load_config(config_file)
+    # config_file is an ed.txt style file, a network model file (.json,
+    # .toml or .yaml, see simlib/network.py) or the dict load_model gives.
+    # Every station is known by its number in the model, all per station
+    # state is a list indexed by it.
+    # antithetic runs on 1 - u for every uniform u of the same replication.
+    # crn='station' draws service times and routing as each station needs
+    # them, crn='patient' draws all of a patient's on arrival, so every
+    # patient keeps the same service times and route whatever the staffing.
+    # arrival_profile (an ArrivalProfile or a profile file) replaces the
+    # constant mean inter-arrival time with a time varying rate.
+    # disciplines maps stations to a queue discipline in
+    # disciplines.DISCIPLINES, over the model's own (fifo when not given).
+    # Anything but fifo ranks patients by the route drawn on their arrival,
+    # so it needs crn='patient', which is what crn=None (the default) picks
+    # then; crn='station' with such a discipline is an error.
+    def __init__(self, config_file, seed=None, replication=0, trace_dir=None, antithetic=False, crn=None, arrival_profile=None, disciplines=None):
+        if isinstance(config_file, dict):
+            self.apply_config(config_file)
+        else:
+            self.apply_config(self.load_model(config_file))
+        # Optional columnar record of every arrival, service start and departure
+        self.trace = TraceWriter(trace_dir) if trace_dir else None
+        # Separate random number streams for arrivals, each station's
+        # service times and routing; replication jumps every stream ahead
+        self.streams = RandomStreams(seed, replication, antithetic=antithetic)
+        self.arrival_stream = self.streams.stream('arrivals')
+        self.routing_stream = self.streams.stream('routing')
+        self.discipline_overrides = dict(disciplines or {})
+        self.use_network(compile_network(self.model_spec()))
+        network = self.network
+        if arrival_profile is None:
+            arrival_profile = network.arrival_profile
+        if isinstance(arrival_profile, str):
+            arrival_profile = ArrivalProfile.load(arrival_profile)
+        self.arrival_profile = arrival_profile
+        # Iterator over the pre-drawn arrival times when there is a profile
+        self.arrival_times = None
+        # Event handle of the pending arrival, None when there is none
+        self.next_arrival = None
+        # Generator the profile arrivals come from and the time they are drawn up to
+        self.arrival_generator = None
+        self.arrivals_end = 0
         self.current_time = 0
-        self.event_queue = []
+        self.started = False
+        self.event_queue = EventList()
+        self.events_processed = 0
+        self.warmup_time = 0
         self.patient_counter = 0
-        self.triage_queue = deque()
-        self.trauma_queue = deque()
-        self.acute_queue = deque()
-        self.prompt_queue = deque()
-
-        # Track patient waiting times in each queue
-        self.waiting_times = {
-            'triage': defaultdict(float),
-            'trauma': defaultdict(float),
-            'acute': defaultdict(float),
-            'prompt': defaultdict(float)
-        }
-
-        # To compute average delay and queue length over time
-        self.queue_lengths = {'triage': 0, 'trauma': 0, 'acute': 0, 'prompt': 0}
-        self.queue_length_area = {'triage': 0, 'trauma': 0, 'acute': 0, 'prompt': 0}
-
-        # Track the time servers are busy in each area for utilization calculations
-        self.server_busy_time = {'triage': 0, 'trauma': 0, 'acute': 0, 'prompt': 0}
-
-        # Track start of server busy times
-        self.server_start_times = {'triage': None, 'trauma': None, 'acute': None, 'prompt': None}
 
-        # Patient discharges
-        self.triage_patients_discharged = 0
-        self.trauma_patients_discharged = 0
-        self.acute_patients_discharged = 0
-        self.prompt_patients_discharged = 0
-
-    # Load simulation configuration from a file
-    def load_config(self, config_file):
+        if crn not in (None, 'station', 'patient'):
+            raise ValueError(f"crn must be 'station' or 'patient', not {crn!r}")
+        ranked = [name for name, discipline in zip(network.names, network.disciplines) if discipline != 'fifo']
+        if ranked and crn == 'station':
+            raise ValueError(f"crn='station' can not rank patients at {', '.join(ranked)}, their disciplines need crn='patient'")
+        if crn is None:
+            crn = 'patient' if ranked else 'station'
+        self.crn = crn
+        # patient mode: patient_id -> [class, hop, stations on the path, service time at each]
+        self.patient_plans = {}
+
+        # Line of each station
+        self.queues = []
+        for station, discipline in enumerate(network.disciplines):
+            if discipline == 'sept':
+                self.queues.append(PriorityLine(partial(self.expected_work, station)))
+            elif discipline != 'fifo':
+                self.queues.append(PriorityLine(self.acuity))
+            else:
+                self.queues.append(deque())
+        # Preemptive stations: patient_id -> (class, completion time, event handle, time joined) for everyone in service
+        self.in_service = {station: {} for station, discipline in enumerate(network.disciplines) if discipline == 'preemptive'}
+        # Service time left of patients taken off a server
+        self.remaining_service = {}
+
+        # Running statistics of patient waiting times at each station
+        self.waiting_times = [Tally(quantiles=True) for _ in network.names]
+        # Waiting times per (station, priority class), when classes are known on arrival
+        self.class_waits = {}
+        if self.crn == 'patient':
+            for station, classes in enumerate(network.classes):
+                for acuity in classes:
+                    self.class_waits[(station, acuity)] = Tally()
+
+        # To compute average queue length and utilization over time. The
+        # areas of a station are brought up to date only when its line or
+        # busy servers change, from the time of its last change.
+        self.queue_lengths = [0] * network.n
+        self.queue_length_area = [0] * network.n
+        self.server_busy_time = [0] * network.n
+        # server time on hand (servers x time), the servers can change part way
+        self.capacity_time = [0] * network.n
+        self.last_change = [0] * network.n
+        self.busy_servers = [0] * network.n
+
+        # Patients leaving the system from each station
+        self.discharged = [0] * network.n
+
+    # Load simulation configuration from a file into a dict of settings
+    @staticmethod
+    def load_config(config_file):
         try:
             with open(config_file, 'r') as f:
                 lines = f.readlines()
 
-            self.simulation_end_time = int(lines[0].strip())
-
-            triage_config = self.parse_config_line(lines[1], 4)
-            trauma_config = self.parse_config_line(lines[2], 3)
-            acute_config = self.parse_config_line(lines[3], 3)
-            prompt_config = self.parse_config_line(lines[4], 3)
-
-            # Triage area configuration
-            self.triage_servers = triage_config[0]
-            self.triage_inter_arrival_mean = triage_config[1]
-            self.triage_service_mean = triage_config[2]
-            self.triage_discharge_prob = triage_config[3]
-
-            # Trauma area configuration
-            self.trauma_servers = trauma_config[0]
-            self.trauma_service_mean = trauma_config[1]
-            self.trauma_prob = trauma_config[2]
-
-            # Acute care area configuration
-            self.acute_servers = acute_config[0]
-            self.acute_service_mean = acute_config[1]
-            self.acute_prob = acute_config[2]
-
-            # Prompt care area configuration
-            self.prompt_servers = prompt_config[0]
-            self.prompt_service_mean = prompt_config[1]
-            self.prompt_prob = prompt_config[2]
+            parse = EmergencyDepartmentSimulation.parse_config_line
+            triage_config = parse(lines[1], 4)
+            trauma_config = parse(lines[2], 3)
+            acute_config = parse(lines[3], 3)
+            prompt_config = parse(lines[4], 3)
+
+            return {
+                'simulation_end_time': int(lines[0].strip()),
+
+                # Triage area configuration
+                'triage_servers': triage_config[0],
+                'triage_inter_arrival_mean': triage_config[1],
+                'triage_service_mean': triage_config[2],
+                'triage_discharge_prob': triage_config[3],
+
+                # Trauma area configuration
+                'trauma_servers': trauma_config[0],
+                'trauma_service_mean': trauma_config[1],
+                'trauma_prob': trauma_config[2],
+
+                # Acute care area configuration
+                'acute_servers': acute_config[0],
+                'acute_service_mean': acute_config[1],
+                'acute_prob': acute_config[2],
+
+                # Prompt care area configuration
+                'prompt_servers': prompt_config[0],
+                'prompt_service_mean': prompt_config[1],
+                'prompt_prob': prompt_config[2]
+            }
 
         except ValueError as ve:
             print(f"Error loading configuration: {ve}")
@@ -95,129 +200,654 @@ class EmergencyDepartmentSimulation:
             print(f"Error: {e}")
             sys.exit(1)
 
-    def parse_config_line(self, line, expected_length):
+    @staticmethod
+    def parse_config_line(line, expected_length):
         values = list(map(float, line.split()))
         if len(values) != expected_length:
             raise ValueError(f"Expected {expected_length} values but got {len(values)} in line: {line}")
         return values
 
-    # Schedule an event
-    def schedule_event(self, event):
-        heapq.heappush(self.event_queue, event)
+    # Settings from a network model file, or from an ed.txt style file
+    @staticmethod
+    def load_model(config_file):
+        if os.path.splitext(config_file)[1].lower() in ('.json', '.toml', '.yaml', '.yml'):
+            return load_network(config_file)
+        return EmergencyDepartmentSimulation.load_config(config_file)
+
+    # Use a parsed configuration, every ed.txt setting becomes an attribute
+    def apply_config(self, config):
+        self.config = dict(config)
+        if 'stations' not in self.config:
+            for name, value in self.config.items():
+                setattr(self, name, value)
+
+    # Network model of config (the current settings when not given), with
+    # the discipline overrides
+    def model_spec(self, config=None):
+        config = self.config if config is None else config
+        spec = config if 'stations' in config else ed_network_spec(config)
+        if self.discipline_overrides:
+            stations = dict(spec['stations'])
+            for name, discipline in self.discipline_overrides.items():
+                if name not in stations:
+                    raise ValueError(f"Unknown station {name}, stations are {', '.join(stations)}")
+                stations[name] = dict(stations[name], discipline=discipline)
+            spec = dict(spec, stations=stations)
+        return spec
+
+    # Take the settings of a compiled network: run length, arrival rate,
+    # server counts, service time samplers and routing
+    def use_network(self, network):
+        self.network = network
+        self.simulation_end_time = network.end_time
+        self.arrival_mean = network.arrival_mean
+        self.servers = list(network.servers)
+        self.service_means = list(network.service_means)
+        self.service_streams = [self.streams.stream(f'{name}_service') for name in network.names]
+        self.service_times = [make_sampler(stream, service) for stream, service in zip(self.service_streams, network.services)]
+        # Destinations out of each station and the alias tables to draw them
+        self.targets = network.targets
+        self.alias_tables = network.alias_tables
 
-    # Start the simulation
-    def run(self):
-        self.schedule_event(Event(exponential(self.triage_inter_arrival_mean), 'ARRIVAL', self.patient_counter))
+    # Schedule an event
+    def schedule_event(self, time, event_type, patient_id):
+        return self.event_queue.schedule(time, event_type, patient_id)
+
+    # Schedule the first arrival. With a profile every arrival of the run
+    # is drawn here in one go, on the arrivals stream.
+    def start(self):
+        self.started = True
+        if self.arrival_profile is not None:
+            self.arrival_generator = self.streams.generator('arrivals')
+            self.arrivals_end = self.simulation_end_time
+            times = self.arrival_profile.arrivals(self.simulation_end_time, self.arrival_generator, self.streams.antithetic)
+            self.arrival_times = iter(times.tolist())
+        first = self.next_arrival_time()
+        if first < self.simulation_end_time:
+            self.next_arrival = self.schedule_event(first, ARRIVAL, self.patient_counter)
+
+    # Time of the arrival after the current one
+    def next_arrival_time(self):
+        if self.arrival_times is not None:
+            return next(self.arrival_times, math.inf)
+        return self.current_time + self.arrival_stream.exponential(self.arrival_mean)
+
+    # Process every event up to end_time, then close the time averages there.
+    # With close=False the averages stay at each station's last change, so
+    # stopping there (for a checkpoint) changes none of the arithmetic of
+    # the run. With instruments the timed loop runs instead.
+    def advance(self, end_time, close=True, instruments=None):
+        if instruments is not None:
+            return self.advance_instrumented(end_time, close, instruments)
+        event_queue = self.event_queue
+        handle_arrival = self.handle_arrival
+        handle_completion = self.handle_completion
+        processed = 0
+        while event_queue:
+            event = event_queue.pop()
+            time, _, event_type, patient_id = event
+            if time > end_time:
+                # Leave it for the next call to advance
+                event_queue.push(event)
+                break
+            self.current_time = time
+            if event_type:
+                handle_completion(event_type - 1, patient_id)
+            else:
+                handle_arrival(patient_id)
+            processed += 1
+        self.events_processed += processed
 
-        while self.event_queue and self.current_time < self.simulation_end_time:
-            event = heapq.heappop(self.event_queue)
+        if close:
+            self.current_time = end_time
             self.update_statistics()
-            self.current_time = event.time
-            self.handle_event(event)
 
-        # Output the final report
-        self.report()
+    # Names of the event type codes, for instrumentation
+    def event_names(self):
+        return ['arrival'] + [f'{name}_complete' for name in self.network.names]
+
+    # advance() with every event counted and timed into instruments. The
+    # random streams and touch() are swapped for timed ones only for the
+    # length of the call, so a checkpoint never holds them.
+    def advance_instrumented(self, end_time, close, instruments):
+        instruments.bind(self.event_names(), self.network.names)
+        streams = (self.arrival_stream, self.routing_stream, self.service_times)
+        self.arrival_stream = instruments.timed_stream(self.arrival_stream)
+        self.routing_stream = instruments.timed_stream(self.routing_stream)
+        self.service_times = [instruments.timed(sampler, 'rng') for sampler in self.service_times]
+        self.touch = instruments.timed(self.touch, 'stats')
+        handle_arrival = self.handle_arrival
+        handle_completion = self.handle_completion
+        event_queue = self.event_queue
+        queue_lengths = self.queue_lengths
+        high_water = instruments.queue_high_water
+        counts = instruments.events
+        seconds = instruments.seconds
+        clock = time.perf_counter
+        started = clock()
+        processed = 0
+        try:
+            while event_queue:
+                popped = clock()
+                event = event_queue.pop()
+                time_now, _, event_type, patient_id = event
+                if time_now > end_time:
+                    event_queue.push(event)
+                    seconds['event_list'] += clock() - popped
+                    break
+                self.current_time = time_now
+                handled = clock()
+                seconds['event_list'] += handled - popped
+                if event_type:
+                    handle_completion(event_type - 1, patient_id)
+                else:
+                    handle_arrival(patient_id)
+                seconds['handlers'] += clock() - handled
+                counts[event_type] += 1
+                processed += 1
+                if len(event_queue) > instruments.heap_high_water:
+                    instruments.heap_high_water = len(event_queue)
+                for station, length in enumerate(queue_lengths):
+                    if length > high_water[station]:
+                        high_water[station] = length
+            self.events_processed += processed
+            if close:
+                self.current_time = end_time
+                self.update_statistics()
+        finally:
+            self.arrival_stream, self.routing_stream, self.service_times = streams
+            del self.touch
+            instruments.wall += clock() - started
+
+    # Start the simulation, or carry on with a restored one. With
+    # checkpoint_every the state is saved to checkpoint_path at every
+    # multiple of that many time units. instruments (an
+    # instrument.Instruments) counts and times every event of the run.
+    def run(self, verbose=True, checkpoint_every=None, checkpoint_path='ed.ckpt', instruments=None):
+        if checkpoint_every and self.trace is not None:
+            raise ValueError("a traced run can not be checkpointed, the trace files stay open")
+        if not self.started:
+            self.start()
+        if checkpoint_every:
+            next_checkpoint = (self.current_time // checkpoint_every + 1) * checkpoint_every
+            while next_checkpoint < self.simulation_end_time:
+                self.advance(next_checkpoint, close=False, instruments=instruments)
+                self.save_checkpoint(checkpoint_path)
+                next_checkpoint += checkpoint_every
+        self.advance(self.simulation_end_time, instruments=instruments)
+        self.close_trace()
 
-    # Update queue lengths and other statistics at each time step
+        # Output the final report
+        if verbose:
+            self.report()
+        return self.results()
+
+    # The whole model state: event list, lines, statistics and random
+    # streams, pickled and compressed
+    def checkpoint(self):
+        return zlib.compress(pickle.dumps(self, pickle.HIGHEST_PROTOCOL), 1)
+
+    # Write a checkpoint, replacing the old one only once the new one is complete
+    def save_checkpoint(self, path):
+        with open(path + '.tmp', 'wb') as f:
+            f.write(self.checkpoint())
+        os.replace(path + '.tmp', path)
+
+    # Model from checkpoint() bytes or a checkpoint file, run() carries on
+    # exactly where the checkpoint was taken
+    @staticmethod
+    def restore(source):
+        if isinstance(source, str):
+            with open(source, 'rb') as f:
+                source = f.read()
+        return pickle.loads(zlib.decompress(source))
+
+    # A copy of the model as it is now, for what-if branches from one
+    # warmed up state. changes are config settings to use from here on,
+    # replication moves every random stream onto that replication so
+    # branches are independent; otherwise they share random numbers.
+    def fork(self, changes=None, replication=None):
+        branch = pickle.loads(pickle.dumps(self, pickle.HIGHEST_PROTOCOL))
+        if changes:
+            branch.update_config(changes)
+        if replication is not None:
+            branch.streams.reseed(replication)
+            if branch.started:
+                branch.redraw_arrivals()
+        return branch
+
+    # Draw the arrivals after now again, the pending one included, on the
+    # arrivals stream as it is now. A branch on another replication would
+    # otherwise keep the next arrival, and with a profile every one of the
+    # arrivals, drawn before the fork.
+    def redraw_arrivals(self):
+        if self.next_arrival is not None:
+            self.event_queue.cancel(self.next_arrival)
+            self.next_arrival = None
+        if self.arrival_profile is not None:
+            self.arrival_generator = self.streams.generator('arrivals')
+            self.arrivals_end = self.simulation_end_time
+            times = self.arrival_profile.arrivals(self.simulation_end_time, self.arrival_generator, self.streams.antithetic, start=self.current_time)
+            self.arrival_times = iter(times.tolist())
+        following = self.next_arrival_time()
+        if following < self.simulation_end_time:
+            self.next_arrival = self.schedule_event(following, ARRIVAL, self.patient_counter)
+
+    # Arrivals up to a later simulation_end_time: profile arrivals are drawn
+    # on from the old horizon with the same generator, and the next arrival
+    # is scheduled again if the old end time had stopped them
+    def extend_arrivals(self):
+        if self.arrival_profile is not None and self.simulation_end_time > self.arrivals_end:
+            later = self.arrival_profile.arrivals(self.simulation_end_time, self.arrival_generator, self.streams.antithetic, start=self.arrivals_end)
+            self.arrival_times = iter(list(self.arrival_times) + later.tolist())
+            self.arrivals_end = self.simulation_end_time
+        if self.next_arrival is None:
+            following = self.next_arrival_time()
+            if following < self.simulation_end_time:
+                self.next_arrival = self.schedule_event(following, ARRIVAL, self.patient_counter)
+
+    # Change settings of a model part way through: ed.txt settings, or for
+    # a network model end_time, arrival_mean, <station>_servers and
+    # <station>_service_mean. Patients planned on arrival keep the service
+    # times they were given, the stations and their disciplines stay. A
+    # later end time gets the arrivals it needs past the old one.
+    def update_config(self, changes):
+        if 'stations' in self.config:
+            config = apply_settings(self.config, changes)
+        else:
+            for name in changes:
+                if name not in self.config:
+                    raise ValueError(f"Unknown setting {name}, expected one of {', '.join(self.config)}")
+            config = dict(self.config, **changes)
+        network = compile_network(self.model_spec(config))
+        if network.names != self.network.names or network.disciplines != self.network.disciplines:
+            raise ValueError("a running model keeps its stations and their disciplines")
+        # the areas so far are for the old server counts
+        self.update_statistics()
+        self.apply_config(config)
+        self.use_network(network)
+        for station in range(network.n):
+            # Added servers take patients from the line straight away
+            queue = self.queues[station]
+            while queue and self.busy_servers[station] < self.servers[station]:
+                patient_id, arrival_time = queue.popleft()
+                self.queue_lengths[station] -= 1
+                self.busy_servers[station] += 1
+                self.start_service(station, patient_id, arrival_time)
+        if self.started:
+            self.extend_arrivals()
+
+    # An open event trace can not be pickled
+    def __getstate__(self):
+        if self.trace is not None:
+            raise RuntimeError("close the event trace before taking a checkpoint")
+        return self.__dict__.copy()
+
+    # Running totals behind the delay, queue length and utilization measures
+    def snapshot(self):
+        self.update_statistics()
+        totals = {}
+        for station, name in enumerate(self.network.names):
+            waits = self.waiting_times[station]
+            totals[f'{name}_delay'] = (waits.mean * waits.count, waits.count)
+            totals[f'{name}_queue_length'] = (self.queue_length_area[station], self.current_time)
+            totals[f'{name}_utilization'] = (self.server_busy_time[station], self.capacity_time[station])
+        return totals
+
+    # Steady state run: the totals behind every measure are observed once
+    # per interval, the warm-up is cut off (MSER-5 unless warmup is given
+    # in time units) and the rest is split into batches. Stops once every
+    # delay's batch means half width is within precision of its mean, or
+    # at simulation_end_time. A restored model carries on where it was.
+    # instruments counts and times every event, as in run(). The first
+    # check comes after 10 * batches intervals, so with the defaults (200
+    # intervals of 60 minutes) a run shorter than 12000 minutes never stops
+    # early; the steady CLI takes --interval, --precision and --warmup.
+    def run_steady_state(self, interval=60.0, precision=0.05, warmup=None, batches=20, confidence=0.95, verbose=True, instruments=None):
+        if not self.started:
+            self.start()
+        previous = self.snapshot()
+        # measure -> (total, weight) added in each interval, one entry per interval
+        series = {name: ([], []) for name in previous}
+        targets = [name for name in series if name.endswith('_delay')]
+        summary = {}
+        while self.current_time < self.simulation_end_time:
+            self.advance(min(self.current_time + interval, self.simulation_end_time), instruments=instruments)
+            current = self.snapshot()
+            for name, (total, weight) in current.items():
+                last_total, last_weight = previous[name]
+                totals, weights = series[name]
+                totals.append(total - last_total)
+                weights.append(weight - last_weight)
+            previous = current
+
+            observed = len(series[targets[0]][0])
+            if observed < 10 * batches or observed % batches:
+                continue
+            summary = self.batch_summary(series, warmup, interval, batches, confidence)
+            if targets and all(name in summary and summary[name][1] <= precision * abs(summary[name][0]) for name in targets):
+                break
+
+        if not summary:
+            summary = self.batch_summary(series, warmup, interval, batches, confidence)
+        self.close_trace()
+        if verbose:
+            print(f"=== Steady State Report (stopped at {self.current_time:.0f}, warm-up {self.warmup_time:.0f}) ===")
+            for name, (mean, half_width) in summary.items():
+                print(f"{name}: {mean:.4f} +/- {half_width:.4f}")
+        return summary
+
+    # Warm-up deletion and batch means for every measure's interval series.
+    # All series have one entry per interval, so one cut fits them all:
+    # the longest MSER-5 warm-up of the stations' queue lengths, which
+    # have a value in every interval. Each batch's estimate is its total
+    # over its weight, so delays are averaged per patient.
+    def batch_summary(self, series, warmup, interval, batches, confidence):
+        if warmup is None:
+            cut = max(mser5([total / weight for total, weight in zip(*series[name])]) for name in series if name.endswith('_queue_length'))
+        else:
+            cut = int(warmup // interval)
+        self.warmup_time = cut * interval
+        summary = {}
+        for name, (totals, weights) in series.items():
+            if len(totals) - cut >= batches:
+                summary[name] = batch_ratio_means(totals[cut:], weights[cut:], batches, confidence)
+        return summary
+
+    # Bring a station's queue length and busy server areas up to the
+    # current time, just before its line or busy servers change
+    def touch(self, station):
+        elapsed = self.current_time - self.last_change[station]
+        if elapsed:
+            self.queue_length_area[station] += self.queue_lengths[station] * elapsed
+            self.server_busy_time[station] += self.busy_servers[station] * elapsed
+            self.capacity_time[station] += self.servers[station] * elapsed
+            self.last_change[station] = self.current_time
+
+    # Bring every station's areas up to the current time, for the end of
+    # a run and whenever the measures are read
     def update_statistics(self):
-        # Update queue length areas (for average length over time)
-        for queue_name, length in self.queue_lengths.items():
-            self.queue_length_area[queue_name] += length * (self.current_time - self.server_start_times[queue_name] if self.server_start_times[queue_name] else 0)
-            self.server_start_times[queue_name] = self.current_time
-
-    # Handle an event
-    def handle_event(self, event):
-        if event.event_type == 'ARRIVAL':
-            self.handle_arrival(event)
-        elif event.event_type == 'TRIAGE_COMPLETE':
-            self.handle_triage_complete(event)
-        elif event.event_type == 'TRAUMA_COMPLETE':
-            self.handle_trauma_complete(event)
-        elif event.event_type == 'ACUTE_COMPLETE':
-            self.handle_acute_complete(event)
-        elif event.event_type == 'PROMPT_COMPLETE':
-            self.handle_prompt_complete(event)
+        for station in range(self.network.n):
+            self.touch(station)
+
+    # Write out the rest of the event trace
+    def close_trace(self):
+        if self.trace is not None:
+            self.trace.close()
+            self.trace = None
+
+    # Send a patient to a station, they take an idle server or wait in line
+    def join_station(self, station, patient_id):
+        if self.trace is not None:
+            self.trace.record(self.current_time, ARRIVE, station, patient_id)
+        self.touch(station)
+        if self.busy_servers[station] < self.servers[station]:
+            self.busy_servers[station] += 1
+            self.start_service(station, patient_id, self.current_time)
+        elif station in self.in_service and self.preempt(station, patient_id):
+            # Took over the server of a lower class patient
+            pass
+        else:
+            self.queues[station].append((patient_id, self.current_time))
+            self.queue_lengths[station] += 1
+
+    # Preemptive station with every server busy: the worst class patient in
+    # service gives up their server if the new patient's class is better,
+    # and goes back in line to resume with the service they have left
+    def preempt(self, station, patient_id):
+        in_service = self.in_service[station]
+        if not in_service:
+            # a station without servers has nobody to preempt
+            return False
+        victim = max(in_service, key=lambda pid: (in_service[pid][0], in_service[pid][3]))
+        acuity, completion_time, handle, joined = in_service[victim]
+        if self.acuity(patient_id) >= acuity:
+            return False
+        self.event_queue.cancel(handle)
+        del in_service[victim]
+        self.remaining_service[victim] = completion_time - self.current_time
+        self.queues[station].append((victim, joined))
+        self.queue_lengths[station] += 1
+        self.start_service(station, patient_id, self.current_time)
+        return True
+
+    # Delay of a planned patient, overall and for their class
+    def record_wait(self, station, patient_id, wait):
+        self.waiting_times[station].add(wait)
+        self.class_waits[(station, self.acuity(patient_id))].add(wait)
+
+    # Priority class of a planned patient
+    def acuity(self, patient_id):
+        return self.patient_plans[patient_id][0]
+
+    # Expected service a planned patient still needs, from this station on
+    def expected_work(self, station, patient_id):
+        _, hop, stations, _ = self.patient_plans[patient_id]
+        return sum(self.service_means[s] for s in stations[hop:])
+
+    # Service time of a planned patient at the station they are at now
+    def planned_service(self, patient_id):
+        plan = self.patient_plans[patient_id]
+        return plan[3][plan[1]]
+
+    # Put a patient on a server and schedule the end of their service
+    def start_service(self, station, patient_id, arrival_time):
+        if self.trace is not None:
+            self.trace.record(self.current_time, START, station, patient_id)
+        if self.crn == 'patient':
+            service = self.remaining_service.pop(patient_id, None)
+            if service is None:
+                service = self.planned_service(patient_id)
+                # Preemptive stations count the delay when service ends, a
+                # patient may still go back in line before that
+                if station not in self.in_service:
+                    self.record_wait(station, patient_id, self.current_time - arrival_time)
+        else:
+            self.waiting_times[station].add(self.current_time - arrival_time)
+            service = self.service_times[station]()
+        handle = self.schedule_event(self.current_time + service, station + 1, patient_id)
+        if station in self.in_service:
+            self.in_service[station][patient_id] = (self.acuity(patient_id), self.current_time + service, handle, arrival_time)
+
+    # Where a patient goes after a station, network.exit when they leave.
+    # One uniform through the station's alias table, none when there is
+    # only one way to go.
+    def route(self, station):
+        table = self.alias_tables[station]
+        if table is None:
+            return self.targets[station][0]
+        return table.sample(self.routing_stream.random())
+
+    # Path and service times of a new patient, drawn on arrival in patient
+    # mode. Their class is the acuity of the first station on the path
+    # that has one.
+    def plan_patient(self, patient_id):
+        network = self.network
+        stations, services = [], []
+        station = network.entry
+        while station != network.exit:
+            stations.append(station)
+            services.append(self.service_times[station]())
+            station = self.route(station)
+        acuity = next((network.acuity[s] for s in stations if network.acuity[s] is not None), network.exit_class)
+        self.patient_plans[patient_id] = [acuity, 0, stations, services]
+
+    # A server finishes, the next patient in line takes it over
+    def release_server(self, station, patient_id):
+        if self.trace is not None:
+            self.trace.record(self.current_time, DEPART, station, patient_id)
+        if station in self.in_service:
+            # Time in line is everything but the service itself
+            joined = self.in_service[station].pop(patient_id)[3]
+            wait = self.current_time - joined - self.planned_service(patient_id)
+            self.record_wait(station, patient_id, max(0.0, wait))
+        self.touch(station)
+        queue = self.queues[station]
+        # More busy servers than servers only after update_config took some away
+        if queue and self.busy_servers[station] <= self.servers[station]:
+            patient_id, arrival_time = queue.popleft()
+            self.queue_lengths[station] -= 1
+            self.start_service(station, patient_id, arrival_time)
+        else:
+            self.busy_servers[station] -= 1
 
     # Handle patient arrival
-    def handle_arrival(self, event):
+    def handle_arrival(self, patient_id):
         self.patient_counter += 1
-        if self.current_time + exponential(self.triage_inter_arrival_mean) < self.simulation_end_time:
-            self.schedule_event(Event(self.current_time + exponential(self.triage_inter_arrival_mean), 'ARRIVAL', self.patient_counter))
-
-        self.triage_queue.append((event.patient_id, self.current_time))
-        self.queue_lengths['triage'] += 1
-        self.schedule_event(Event(self.current_time + exponential(self.triage_service_mean), 'TRIAGE_COMPLETE', event.patient_id))
-
-    # Handle completion of triage
-    def handle_triage_complete(self, event):
-        patient_id, arrival_time = self.triage_queue.popleft()
-        self.queue_lengths['triage'] -= 1
-        wait_time = self.current_time - arrival_time
-        self.waiting_times['triage'][patient_id] = wait_time
-        if random.random() < self.triage_discharge_prob:
-            self.triage_patients_discharged += 1
+        next_arrival = self.next_arrival_time()
+        if next_arrival < self.simulation_end_time:
+            self.next_arrival = self.schedule_event(next_arrival, ARRIVAL, self.patient_counter)
         else:
-            r = random.random()
-            if r < self.trauma_prob:
-                self.trauma_queue.append((patient_id, self.current_time))
-                self.queue_lengths['trauma'] += 1
-                self.schedule_event(Event(self.current_time + exponential(self.trauma_service_mean), 'TRAUMA_COMPLETE', patient_id))
-            elif r < self.trauma_prob + self.acute_prob:
-                self.acute_queue.append((patient_id, self.current_time))
-                self.queue_lengths['acute'] += 1
-                self.schedule_event(Event(self.current_time + exponential(self.acute_service_mean), 'ACUTE_COMPLETE', patient_id))
+            self.next_arrival = None
+
+        if self.crn == 'patient':
+            self.plan_patient(patient_id)
+        self.join_station(self.network.entry, patient_id)
+
+    # Handle the end of a service: the patient moves on to the next station
+    # on their route or leaves
+    def handle_completion(self, station, patient_id):
+        self.release_server(station, patient_id)
+        if self.crn == 'patient':
+            plan = self.patient_plans[patient_id]
+            plan[1] += 1
+            if plan[1] < len(plan[2]):
+                following = plan[2][plan[1]]
             else:
-                self.prompt_queue.append((patient_id, self.current_time))
-                self.queue_lengths['prompt'] += 1
-                self.schedule_event(Event(self.current_time + exponential(self.prompt_service_mean), 'PROMPT_COMPLETE', patient_id))
-
-    # Handle completion of trauma care
-    def handle_trauma_complete(self, event):
-        patient_id, arrival_time = self.trauma_queue.popleft()
-        self.queue_lengths['trauma'] -= 1
-        self.waiting_times['trauma'][patient_id] = self.current_time - arrival_time
-        self.trauma_patients_discharged += 1
-
-    # Handle completion of acute care
-    def handle_acute_complete(self, event):
-        patient_id, arrival_time = self.acute_queue.popleft()
-        self.queue_lengths['acute'] -= 1
-        self.waiting_times['acute'][patient_id] = self.current_time - arrival_time
-        self.acute_patients_discharged += 1
-
-    # Handle completion of prompt care
-    def handle_prompt_complete(self, event):
-        patient_id, arrival_time = self.prompt_queue.popleft()
-        self.queue_lengths['prompt'] -= 1
-        self.waiting_times['prompt'][patient_id] = self.current_time - arrival_time
-        self.prompt_patients_discharged += 1
+                following = self.network.exit
+                del self.patient_plans[patient_id]
+        else:
+            following = self.route(station)
+        if following == self.network.exit:
+            self.discharged[station] += 1
+        else:
+            self.join_station(following, patient_id)
+
+    # Output measures of the run, keyed by measure and station name
+    def results(self):
+        self.update_statistics()
+        names = self.network.names
+        results = {}
+        for station, name in enumerate(names):
+            waits = self.waiting_times[station]
+            results[f'{name}_delay'] = waits.mean
+            for p in (50, 95, 99):
+                results[f'{name}_delay_p{p}'] = waits.quantile(p / 100)
+        # Delay per priority class
+        for (station, acuity), waits in self.class_waits.items():
+            results[f'{names[station]}_delay_class{acuity}'] = waits.mean
+        for station, name in enumerate(names):
+            results[f'{name}_queue_length'] = self.queue_length_area[station] / self.current_time if self.current_time > 0 else 0
+        for station, name in enumerate(names):
+            capacity = self.capacity_time[station]
+            results[f'{name}_utilization'] = self.server_busy_time[station] / capacity if capacity > 0 else 0
+        return results
+
+    # Control variates, each with expectation 0: the mean of the standard
+    # exponentials behind the uniforms drawn for inter-arrival and service
+    # times, minus 1
+    def controls(self):
+        controls = {'arrivals': self.arrival_stream.exponential_mean() - 1}
+        for name, stream in zip(self.network.names, self.service_streams):
+            controls[f'{name}_service'] = stream.exponential_mean() - 1
+        return controls
 
     # Final report
     def report(self):
         print("=== Final Report ===")
-        
+        results = self.results()
+        names = self.network.names
+
         # Calculate average waiting times (delays) in each queue
-        for area in ['triage', 'trauma', 'acute', 'prompt']:
-            total_wait_time = sum(self.waiting_times[area].values())
-            num_patients = len(self.waiting_times[area])
-            average_wait_time = total_wait_time / num_patients if num_patients > 0 else 0
-            print(f"Average delay in {area.capitalize()} Queue: {average_wait_time:.2f} time units")
+        for name in names:
+            print(f"Average delay in {name.capitalize()} Queue: {results[f'{name}_delay']:.2f} time units")
 
-        # Calculate average queue lengths
-        for area in ['triage', 'trauma', 'acute', 'prompt']:
-            average_queue_length = self.queue_length_area[area] / self.current_time
-            print(f"Average number of patients in {area.capitalize()} Queue: {average_queue_length:.2f}")
+        # Delay percentiles in each queue
+        for name in names:
+            print(f"Delay p50/p95/p99 in {name.capitalize()} Queue: {results[f'{name}_delay_p50']:.2f} / {results[f'{name}_delay_p95']:.2f} / {results[f'{name}_delay_p99']:.2f}")
+
+        # Delay of each priority class at the stations that serve more than one
+        for station, name in enumerate(names):
+            classes = [acuity for s, acuity in self.class_waits if s == station]
+            if len(classes) > 1:
+                delays = ' / '.join(f"{results[f'{name}_delay_class{acuity}']:.2f}" for acuity in classes)
+                print(f"Delay by class {'/'.join(map(str, classes))} in {name.capitalize()} Queue ({self.network.disciplines[station]}): {delays}")
 
-        # Server utilization for each care area
-        for area in ['triage', 'trauma', 'acute', 'prompt']:
-            utilization = self.server_busy_time[area] / self.current_time
-            print(f"Server utilization in {area.capitalize()}: {utilization:.2f}")
+        # Calculate average queue lengths
+        for name in names:
+            print(f"Average number of patients in {name.capitalize()} Queue: {results[f'{name}_queue_length']:.2f}")
+
+        # Server utilization for each station
+        for name in names:
+            print(f"Server utilization in {name.capitalize()}: {results[f'{name}_utilization']:.2f}")
+
+# Result cache key of one run. A network model only names its arrival
+# profile file, so the file's contents go into the key as well.
+def run_key(cache, config, seed, replication):
+    parts = {'config': config, 'seed': seed, 'replication': replication}
+    profile = config.get('arrivals', {}).get('profile') if 'stations' in config else None
+    if profile:
+        parts['profile'] = source_version(profile)
+    return cache.key(**parts)
+
+# Results of one run, taken from the cache when this configuration, seed and
+# replication were already run by the same model code. A run without a seed
+# is never the same twice, so it is not cached.
+def run_cached(config_file, seed=None, replication=0, cache='ed_cache.sqlite'):
+    if seed is None:
+        return EmergencyDepartmentSimulation(config_file, replication=replication).run(verbose=False)
+    if not isinstance(cache, ResultCache):
+        # a cache opened here is closed here, so its hits are written out
+        with closing(ResultCache(cache, MODEL_VERSION)) as opened:
+            return run_cached(config_file, seed, replication, opened)
+    config = config_file if isinstance(config_file, dict) else EmergencyDepartmentSimulation.load_model(config_file)
+    key = run_key(cache, config, seed, replication)
+    results = cache.get(key)
+    if results is None:
+        results = EmergencyDepartmentSimulation(config, seed=seed, replication=replication).run(verbose=False)
+        cache.put(key, results)
+    return results
 
 if __name__ == '__main__':
     if len(sys.argv) < 2:
-        print("Usage: python emergency_simulation.py <config_file>")
+        print("Usage: python emergency_simulation.py <config_file | model.json/.toml/.yaml> [steady [--interval <minutes>] [--precision <fraction>] [--warmup <minutes>]] [--trace <dir>] [--profile <file>] [--discipline <station>=fifo|priority|preemptive|sept ...] [--checkpoint <file> <every>] [--restore <file>] [--instrument <file.json>]")
         sys.exit(1)
 
     config_file = sys.argv[1]
-    simulation = EmergencyDepartmentSimulation(config_file)
-    simulation.run()
+    trace_dir = None
+    if '--trace' in sys.argv:
+        trace_dir = sys.argv[sys.argv.index('--trace') + 1]
+    profile = None
+    if '--profile' in sys.argv:
+        profile = sys.argv[sys.argv.index('--profile') + 1]
+    disciplines = {}
+    for i, arg in enumerate(sys.argv):
+        if arg == '--discipline':
+            station, _, discipline = sys.argv[i + 1].partition('=')
+            disciplines[station] = discipline
+    every = None
+    checkpoint_path = 'ed.ckpt'
+    if '--checkpoint' in sys.argv:
+        checkpoint_path = sys.argv[sys.argv.index('--checkpoint') + 1]
+        every = float(sys.argv[sys.argv.index('--checkpoint') + 2])
+    if trace_dir and every:
+        print("--trace and --checkpoint can not be used together, a checkpoint can not hold open trace files")
+        sys.exit(1)
+    if '--restore' in sys.argv:
+        simulation = EmergencyDepartmentSimulation.restore(sys.argv[sys.argv.index('--restore') + 1])
+    else:
+        simulation = EmergencyDepartmentSimulation(config_file, trace_dir=trace_dir, arrival_profile=profile, disciplines=disciplines)
+    instruments = None
+    if '--instrument' in sys.argv:
+        instruments = Instruments()
+    if 'steady' in sys.argv[2:]:
+        steady = {}
+        for flag in ('interval', 'precision', 'warmup'):
+            if f'--{flag}' in sys.argv:
+                steady[flag] = float(sys.argv[sys.argv.index(f'--{flag}') + 1])
+        simulation.run_steady_state(instruments=instruments, **steady)
+    else:
+        simulation.run(checkpoint_every=every, checkpoint_path=checkpoint_path, instruments=instruments)
+    if instruments is not None:
+        instruments.report()
+        instruments.to_json(sys.argv[sys.argv.index('--instrument') + 1])
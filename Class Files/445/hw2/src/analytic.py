@@ -0,0 +1,93 @@
+'''
+analytic.py
+Steady state measures of the emergency department network in closed form.
+Arrivals are Poisson, services exponential and routing random, so every
+station is an M/M/c queue fed at its Jackson network flow, from the
+traffic equations of the model's routing table (for other service time
+distributions the same formulas are an approximation). Takes an ed.txt
+style config or a network model, anything load_model gives, runs in
+microseconds, flags stations with rho >= 1, and with a replication count
+checks the simulator against it.
+usage: python3 analytic.py <config_file> [replications] [workers]
+'''
+import os
+import sys
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../simlib"))
+
+import numpy as np
+
+from GPT2 import EmergencyDepartmentSimulation, ed_network_spec
+from network import compile_network
+from queueing import mmc
+
+
+# Compiled network of an ed.txt style config or a network model
+def compile_model(config):
+    return compile_network(config if 'stations' in config else ed_network_spec(config))
+
+
+# Arrival rate into each station, the solution of the traffic equations
+# rate = external + rate @ routing
+def area_flows(config):
+    network = compile_model(config)
+    if network.arrival_mean is None:
+        raise ValueError("the closed form needs a constant arrival mean, not a profile")
+    external = np.zeros(network.n)
+    external[network.entry] = 1 / network.arrival_mean
+    rates = np.linalg.solve(np.eye(network.n) - network.routing[:, :network.n].T, external)
+    return dict(zip(network.names, rates.tolist()))
+
+
+# Steady state delay, queue length and utilization per station, keyed like results()
+def ed_network(config):
+    network = compile_model(config)
+    measures = {}
+    flows = area_flows(config)
+    for station, name in enumerate(network.names):
+        queue = mmc(flows[name], network.service_means[station], network.servers[station])
+        measures[f'{name}_arrival_rate'] = flows[name]
+        measures[f'{name}_delay'] = queue['Wq']
+        measures[f'{name}_queue_length'] = queue['Lq']
+        measures[f'{name}_utilization'] = queue['rho']
+    return measures
+
+
+# Stations that have no steady state, rho >= 1
+def unstable_areas(config):
+    measures = ed_network(config)
+    return [name for name in compile_model(config).names if measures[f'{name}_utilization'] >= 1]
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python analytic.py <config_file> [replications] [workers]")
+        sys.exit(1)
+
+    config = EmergencyDepartmentSimulation.load_model(sys.argv[1])
+    names = compile_model(config).names
+    start = time.perf_counter()
+    measures = ed_network(config)
+    elapsed = time.perf_counter() - start
+    print(f"=== Jackson Network, {elapsed * 1e6:.0f} us ===")
+    for area in names:
+        flag = '  UNSTABLE' if measures[f'{area}_utilization'] >= 1 else ''
+        print(f"{area.capitalize():<7} rate {measures[f'{area}_arrival_rate']:.4f}  rho {measures[f'{area}_utilization']:.4f}"
+              f"  Lq {measures[f'{area}_queue_length']:.4f}  Wq {measures[f'{area}_delay']:.4f}{flag}")
+
+    if len(sys.argv) > 2:
+        from replicate import ed_replication
+        from replications import replicate, summarize
+
+        n = int(sys.argv[2])
+        workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+        summary = summarize(replicate(partial(ed_replication, config), n, workers=workers))
+        print(f"=== Simulated, {n} Replications, 95% Confidence Intervals ===")
+        for area in names:
+            for measure in ('delay', 'queue_length', 'utilization'):
+                name = f'{area}_{measure}'
+                mean, half = summary[name]
+                inside = 'ok' if abs(mean - measures[name]) <= half else 'OUTSIDE'
+                print(f"{name:<22} analytic {measures[name]:10.4f}  simulated {mean:10.4f} +/- {half:.4f}  {inside}")
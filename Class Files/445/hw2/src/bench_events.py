@@ -0,0 +1,92 @@
+'''
+bench_events.py
+Events per second of the emergency department model with tuple events and
+the handler table, against the old layout where every event was an Event
+object compared through a Python __lt__ and dispatched by string.
+usage: python3 bench_events.py <config_file> [horizon_multiplier]
+'''
+import heapq
+import math
+import random
+import sys
+import time
+
+from GPT2 import EmergencyDepartmentSimulation
+
+
+# The exponential variate GPT2 drew with before its streams
+def exponential(mean, rng=random):
+    return -mean * math.log(rng.random())
+
+
+# The event record GPT2 used before, kept here only for comparison
+class Event:
+    def __init__(self, time, event_type, patient_id):
+        self.time = time
+        self.event_type = event_type
+        self.patient_id = patient_id
+
+    def __lt__(self, other):
+        return self.time < other.time
+
+
+# Same model driven the old way: Event objects on a heapq, string if/elif
+class LegacyEventSimulation(EmergencyDepartmentSimulation):
+    def __init__(self, config_file, seed=None):
+        super().__init__(config_file, seed)
+        self.event_queue = []
+        self.event_names = ['ARRIVAL'] + [f'{name.upper()}_COMPLETE' for name in self.network.names]
+
+    def schedule_event(self, time, event_type, patient_id):
+        heapq.heappush(self.event_queue, Event(time, self.event_names[event_type], patient_id))
+
+    def run(self, verbose=False):
+        self.schedule_event(exponential(self.arrival_mean, self.arrival_stream), 0, self.patient_counter)
+        while self.event_queue:
+            event = heapq.heappop(self.event_queue)
+            if event.time > self.simulation_end_time:
+                break
+            self.current_time = event.time
+            self.update_statistics()
+            self.events_processed += 1
+            if event.event_type == 'ARRIVAL':
+                self.handle_arrival(event.patient_id)
+            elif event.event_type == 'TRIAGE_COMPLETE':
+                self.handle_completion(0, event.patient_id)
+            elif event.event_type == 'TRAUMA_COMPLETE':
+                self.handle_completion(1, event.patient_id)
+            elif event.event_type == 'ACUTE_COMPLETE':
+                self.handle_completion(2, event.patient_id)
+            elif event.event_type == 'PROMPT_COMPLETE':
+                self.handle_completion(3, event.patient_id)
+        self.current_time = self.simulation_end_time
+        self.update_statistics()
+        return self.results()
+
+
+# Best of a few runs, in events per second
+def events_per_second(model, config_file, multiplier, repeats=3):
+    best = 0.0
+    for _ in range(repeats):
+        simulation = model(config_file, seed=1)
+        simulation.simulation_end_time *= multiplier
+        start = time.perf_counter()
+        simulation.run(verbose=False)
+        elapsed = time.perf_counter() - start
+        best = max(best, simulation.events_processed / elapsed)
+    return best
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 2:
+        print("Usage: python bench_events.py <config_file> [horizon_multiplier]")
+        sys.exit(1)
+
+    config_file = sys.argv[1]
+    multiplier = int(sys.argv[2]) if len(sys.argv) > 2 else 20
+
+    before = events_per_second(LegacyEventSimulation, config_file, multiplier)
+    after = events_per_second(EmergencyDepartmentSimulation, config_file, multiplier)
+    print(f"Event objects, string dispatch: {before:,.0f} events/s")
+    print(f"Tuple events, handler table:    {after:,.0f} events/s")
+    print(f"Speedup: {after / before:.2f}x")
@@ -1,14 +1,19 @@
 import os
 import sys
-import random
 from queue import Queue
 
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../simlib"))
+
+from rng import RandomStreams
+
 class SSES():
-    def __init__(self, fileLoc):
+    def __init__(self, fileLoc, seed=1, replication=0):
         self.fileLoc = fileLoc
-        self.iaRand = random.Random(1)
-        self.uniRand = random.Random(2)
-        self.serviceRand = random.Random(3)
+        # one independent stream per purpose, replication jumps them ahead
+        self.streams = RandomStreams(seed, replication)
+        self.iaRand = self.streams.stream("arrivals")
+        self.uniRand = self.streams.stream("routing")
+        self.serviceRand = self.streams.stream("service")
         self.sim_clock = 0.0
         self.SERVER_IDLE = 0
         self.SERVER_BUSY = 1
@@ -58,16 +63,16 @@ class SSES():
             
     
     def iaRandom(self, mean):
-        return self.iaRand.expovariate(1/mean)
+        return self.iaRand.exponential(mean)
     
     def serviceRandom(self, mean):
-        return self.serviceRand.expovariate(1/mean)
+        return self.serviceRand.exponential(mean)
     
     def start(self):
         print("Thinking...")
         
     def moveProb(self, prob):
-        if (self.uniRand.uniform(0,1) <= prob):
+        if (self.uniRand.random() <= prob):
             return True
         else:
             return False
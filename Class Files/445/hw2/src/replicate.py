@@ -0,0 +1,36 @@
+'''
+replicate.py
+Runs independent replications of the emergency department model across
+every core and prints each measure with a confidence interval.
+usage: python3 replicate.py <config_file> <replications> [workers]
+'''
+import os
+import sys
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../simlib"))
+
+from GPT2 import EmergencyDepartmentSimulation
+from replications import replicate, summarize, print_summary
+
+
+# One replication of the ED model, its streams jumped ahead by index
+def ed_replication(config_file, seed, index):
+    simulation = EmergencyDepartmentSimulation(config_file, seed=seed, replication=index)
+    return simulation.run(verbose=False)
+
+
+if __name__ == '__main__':
+    if len(sys.argv) < 3:
+        print("Usage: python replicate.py <config_file> <replications> [workers]")
+        sys.exit(1)
+
+    config_file = sys.argv[1]
+    n = int(sys.argv[2])
+    workers = int(sys.argv[3]) if len(sys.argv) > 3 else None
+
+    start = time.perf_counter()
+    results = replicate(partial(ed_replication, config_file), n, workers=workers)
+    print_summary(summarize(results), n)
+    print(f"wall time: {time.perf_counter() - start:.2f}s")
@@ -0,0 +1,115 @@
+'''
+select_best.py
+Chooses the best ED staffing plan among a grid of candidates with the KN
+ranking and selection procedure. Each stage runs one more replication of
+every plan still in contention (all plans on the same streams, so common
+random numbers), plans that are clearly worse are dropped, and the winner
+is the best plan, or within delta of it, with probability 1 - alpha.
+
+The objective is the sum of the chosen measures (all station delays by
+default) plus server_cost for every server in the plan, and is minimized.
+
+usage: python3 select_best.py <config_file> [options] name=values ...
+    name=1,2,3    candidate values for a setting, every combination is a plan
+options: --delta D  --alpha A  --n0 N  --measure M ...  --server-cost C
+         --seed S  --workers W  --cache FILE
+'''
+import argparse
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../simlib"))
+
+from GPT2 import EmergencyDepartmentSimulation, MODEL_VERSION, run_key
+from analytic import compile_model
+from resultcache import ResultCache
+from selection import kn_select, equal_allocation
+from sweep import parse_space, grid_scenarios, scenario_replication, setting
+
+
+# Objective for one replication's results: measures plus staffing cost
+def objective(servers, results, measures, server_cost):
+    return sum(results[m] for m in measures) + server_cost * servers
+
+
+# Runs (plan, replication) jobs on a pool, through the result cache
+class StageRunner:
+    def __init__(self, plans, seed, measures, server_cost, pool=None, cache=None):
+        self.plans = plans
+        # servers in each plan, over all of its stations
+        self.servers = [sum(compile_model(plan).servers) for plan in plans]
+        self.seed = seed
+        self.measures = measures
+        self.server_cost = server_cost
+        self.pool = pool
+        self.cache = cache
+        self.simulated = 0
+
+    def __call__(self, jobs):
+        results = [None] * len(jobs)
+        todo = []
+        for n, (i, r) in enumerate(jobs):
+            if self.cache is not None:
+                results[n] = self.cache.get(run_key(self.cache, self.plans[i], self.seed, r))
+            if results[n] is None:
+                todo.append((n, self.plans[i], self.seed, r))
+        finished = self.pool.map(scenario_replication, todo) if self.pool else map(scenario_replication, todo)
+        for n, r, result in finished:
+            results[n] = result
+            if self.cache is not None:
+                self.cache.put(run_key(self.cache, self.plans[jobs[n][0]], self.seed, r), result)
+        self.simulated += len(todo)
+        return [objective(self.servers[i], result, self.measures, self.server_cost)
+                for (i, _), result in zip(jobs, results)]
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Pick the best ED staffing plan by KN ranking and selection")
+    parser.add_argument('config_file')
+    parser.add_argument('space', nargs='+', help="name=v1,v2,...")
+    parser.add_argument('--delta', type=float, default=0.5, help="indifference zone, in objective units")
+    parser.add_argument('--alpha', type=float, default=0.05)
+    parser.add_argument('--n0', type=int, default=10, help="first stage replications")
+    parser.add_argument('--measure', action='append', help="measure to add to the objective (repeatable)")
+    parser.add_argument('--server-cost', type=float, default=0.0)
+    parser.add_argument('--seed', type=int, default=12345)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache', default='ed_cache.sqlite', help="result cache file, '' for none")
+    args = parser.parse_args()
+
+    base = EmergencyDepartmentSimulation.load_model(args.config_file)
+    try:
+        space = parse_space(args.space, base)
+    except ValueError as ve:
+        parser.error(str(ve))
+    if any(isinstance(values, tuple) for values in space.values()):
+        parser.error("candidates are listed values, name=v1,v2,...")
+    plans = grid_scenarios(base, space)
+    if len(plans) < 2:
+        parser.error("need at least two candidate plans")
+    measures = args.measure or [f'{name}_delay' for name in compile_model(base).names]
+
+    workers = args.workers or os.cpu_count() or 1
+    pool = ProcessPoolExecutor(max_workers=workers) if workers > 1 else None
+    cache = ResultCache(args.cache, MODEL_VERSION) if args.cache else None
+    runner = StageRunner(plans, args.seed, measures, args.server_cost, pool, cache)
+
+    start = time.perf_counter()
+    best, observations = kn_select(len(plans), None, args.delta, args.alpha, args.n0, run_jobs=runner)
+    elapsed = time.perf_counter() - start
+    if pool:
+        pool.shutdown()
+    if cache is not None:
+        cache.close()
+
+    names = list(space)
+    for i, (plan, obs) in enumerate(zip(plans, observations)):
+        mark = '*' if i == best else ' '
+        settings = ' '.join(f'{name}={setting(plan, name):g}' for name in names)
+        print(f"{mark} {settings:<40} objective {sum(obs) / len(obs):10.3f}  replications {len(obs)}")
+    used = sum(len(obs) for obs in observations)
+    equal = len(plans) * equal_allocation(len(plans), observations, args.delta, args.alpha, args.n0)
+    print(f"best plan with probability >= {1 - args.alpha:.2f} (delta {args.delta:g}), "
+          f"{used} replications ({runner.simulated} simulated) against {equal} for equal allocation, {elapsed:.2f}s")
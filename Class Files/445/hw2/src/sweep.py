@@ -0,0 +1,179 @@
+'''
+sweep.py
+Runs the emergency department model over many configurations. Parameters
+are varied on a full grid or sampled by Latin hypercube, every scenario
+gets the same replications on the same named streams (common random
+numbers), all scenario x replication runs share one process pool, finished
+replications are kept in the result cache, and the results land in one
+CSV table.
+
+usage: python3 sweep.py <config_file> [options] name=values ...
+    name=1,2,3    grid values for a setting in the config, for a network
+                  model end_time, arrival_mean, <station>_servers or
+                  <station>_service_mean
+    name=5:8      range for a setting, sampled with --lhs N
+options: --lhs N  --reps R  --seed S  --workers W  --cache FILE  --out FILE
+         --screen  skip scenarios the Jackson network model finds unstable
+'''
+import argparse
+import csv
+import itertools
+import os
+import sys
+import time
+from concurrent.futures import ProcessPoolExecutor
+
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../simlib"))
+
+from GPT2 import EmergencyDepartmentSimulation, MODEL_VERSION, run_key
+from analytic import unstable_areas
+from network import apply_settings, get_setting
+from replications import summarize
+from resultcache import ResultCache
+
+
+# Copy of a config with some settings changed, ed.txt style or network model
+def with_settings(base, changes):
+    if 'stations' in base:
+        return apply_settings(base, changes)
+    return dict(base, **changes)
+
+
+# Value of one setting in a config, ed.txt style or network model
+def setting(config, name):
+    if 'stations' in config:
+        return get_setting(config, name)
+    return config[name]
+
+
+# name=1,2,3 -> list of values, name=5:8 -> (low, high) range
+def parse_space(specs, base):
+    space = {}
+    for spec in specs:
+        name, _, values = spec.partition('=')
+        if 'stations' in base:
+            get_setting(base, name)
+        elif name not in base:
+            raise ValueError(f"Unknown setting {name}, expected one of {', '.join(base)}")
+        if ':' in values:
+            low, high = values.split(':')
+            space[name] = (float(low), float(high))
+        else:
+            space[name] = [float(v) for v in values.split(',')]
+    return space
+
+
+# Every combination of the listed values
+def grid_scenarios(base, space):
+    names = list(space)
+    scenarios = []
+    for values in itertools.product(*(space[name] for name in names)):
+        scenarios.append(with_settings(base, dict(zip(names, values))))
+    return scenarios
+
+
+# n points with each range cut into n strata and every stratum used once
+def lhs_scenarios(base, space, n, seed=12345):
+    rng = np.random.default_rng(seed)
+    changes = [{} for _ in range(n)]
+    for name, (low, high) in space.items():
+        points = (rng.permutation(n) + rng.random(n)) / n
+        values = low + points * (high - low)
+        for change, value in zip(changes, values):
+            # server counts have to stay whole numbers
+            change[name] = float(round(value)) if name.endswith('_servers') else float(value)
+    return [with_settings(base, change) for change in changes]
+
+
+# One replication of one scenario, run in a worker process
+def scenario_replication(job):
+    index, config, seed, replication = job
+    simulation = EmergencyDepartmentSimulation(config, seed=seed, replication=replication)
+    return index, replication, simulation.run(verbose=False)
+
+
+# Summaries for every scenario. Replications already in the result cache
+# (same config, seed, replication and model code) are not run again.
+def sweep(scenarios, reps=10, seed=12345, workers=None, cache_path=None):
+    cache = ResultCache(cache_path, MODEL_VERSION) if cache_path else None
+    results = [[None] * reps for _ in scenarios]
+    jobs = []
+    for i, config in enumerate(scenarios):
+        for r in range(reps):
+            if cache is not None:
+                results[i][r] = cache.get(run_key(cache, config, seed, r))
+            if results[i][r] is None:
+                jobs.append((i, config, seed, r))
+
+    if jobs:
+        workers = workers or os.cpu_count() or 1
+        if workers <= 1:
+            finished = map(scenario_replication, jobs)
+        else:
+            pool = ProcessPoolExecutor(max_workers=workers)
+            finished = pool.map(scenario_replication, jobs, chunksize=max(1, len(jobs) // (workers * 4)))
+        for i, r, result in finished:
+            results[i][r] = result
+            if cache is not None:
+                cache.put(run_key(cache, scenarios[i], seed, r), result)
+        if workers > 1:
+            pool.shutdown()
+    if cache is not None:
+        cache.close()
+    return [summarize(runs) for runs in results]
+
+
+# One row per scenario: the swept settings, then mean and half width per measure
+def write_table(path, scenarios, summaries, names):
+    measures = list(summaries[0])
+    with open(path, 'w', newline='') as f:
+        writer = csv.writer(f)
+        writer.writerow(names + [f'{m}_{part}' for m in measures for part in ('mean', 'half_width')])
+        for config, summary in zip(scenarios, summaries):
+            row = [setting(config, name) for name in names]
+            for m in measures:
+                row.extend(summary[m])
+            writer.writerow(row)
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Parameter sweep over ED configurations")
+    parser.add_argument('config_file')
+    parser.add_argument('space', nargs='+', help="name=v1,v2,... or name=low:high")
+    parser.add_argument('--lhs', type=int, default=0, help="Latin hypercube points (ranges only)")
+    parser.add_argument('--reps', type=int, default=10)
+    parser.add_argument('--seed', type=int, default=12345)
+    parser.add_argument('--workers', type=int, default=None)
+    parser.add_argument('--cache', default='ed_cache.sqlite', help="result cache file, '' for none")
+    parser.add_argument('--out', default='sweep_results.csv')
+    parser.add_argument('--screen', action='store_true', help="skip scenarios with an area at rho >= 1")
+    args = parser.parse_args()
+
+    base = EmergencyDepartmentSimulation.load_model(args.config_file)
+    try:
+        space = parse_space(args.space, base)
+    except ValueError as ve:
+        parser.error(str(ve))
+    ranges = [name for name, values in space.items() if isinstance(values, tuple)]
+    if args.lhs:
+        if len(ranges) != len(space):
+            parser.error("--lhs needs every setting given as a low:high range")
+        scenarios = lhs_scenarios(base, space, args.lhs, args.seed)
+    else:
+        if ranges:
+            parser.error(f"{', '.join(ranges)} given as a range, use --lhs N or list the values")
+        scenarios = grid_scenarios(base, space)
+
+    if args.screen:
+        stable = [config for config in scenarios if not unstable_areas(config)]
+        print(f"{len(scenarios) - len(stable)} of {len(scenarios)} scenarios unstable, not simulated")
+        scenarios = stable
+        if not scenarios:
+            sys.exit(0)
+
+    start = time.perf_counter()
+    summaries = sweep(scenarios, args.reps, args.seed, args.workers, args.cache)
+    write_table(args.out, scenarios, summaries, list(space))
+    print(f"{len(scenarios)} scenarios x {args.reps} replications in {time.perf_counter() - start:.2f}s, results in {args.out}")
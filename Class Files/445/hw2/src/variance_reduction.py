@@ -0,0 +1,81 @@
+'''
+variance_reduction.py
+Shows what the variance reduction options buy on the emergency department
+model, each against independent replications of the same total number of
+runs:
+    antithetic pairs    replications 0..n/2-1, each with its mirror image
+    control variates    the n replications adjusted on the arrival and
+                        service stream means, whose expectations are known
+    common random nums  the difference to a changed configuration, same
+                        streams against independent ones (with --compare)
+usage: python3 variance_reduction.py <config_file> <replications>
+           [--compare name=value ...] [--crn station|patient] [--workers W]
+'''
+import argparse
+import os
+import sys
+import time
+from functools import partial
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), "../../simlib"))
+
+from GPT2 import EmergencyDepartmentSimulation
+from analytic import compile_model
+from replications import replicate
+from variance import antithetic, control_variates, common_random_numbers, print_reduction
+from sweep import parse_space, with_settings
+
+
+# Delay, queue length and utilization of every station of a config
+def station_measures(config):
+    names = compile_model(config).names
+    return [f'{name}_{measure}' for measure in ('delay', 'queue_length', 'utilization') for name in names]
+
+
+# One replication with its control variates; offset moves it onto other streams
+def vr_replication(config, crn, mirrored, offset, seed, index):
+    simulation = EmergencyDepartmentSimulation(config, seed=seed, replication=index + offset, antithetic=mirrored, crn=crn)
+    return {'results': simulation.run(verbose=False), 'controls': simulation.controls()}
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description="Variance reduction report for the ED model")
+    parser.add_argument('config_file')
+    parser.add_argument('replications', type=int)
+    parser.add_argument('--compare', nargs='+', default=[], help="name=value settings of the second configuration")
+    parser.add_argument('--crn', choices=['station', 'patient'], default='patient')
+    parser.add_argument('--seed', type=int, default=12345)
+    parser.add_argument('--workers', type=int, default=None)
+    args = parser.parse_args()
+    n = args.replications
+    if n < 4:
+        parser.error("need at least 4 replications")
+
+    base = EmergencyDepartmentSimulation.load_model(args.config_file)
+    measures = station_measures(base)
+    start = time.perf_counter()
+    run = partial(replicate, seed=args.seed, workers=args.workers)
+    plain = run(partial(vr_replication, base, args.crn, False, 0), n)
+    mirrored = run(partial(vr_replication, base, args.crn, True, 0), n // 2)
+
+    def column(runs, name):
+        return [r['results'][name] for r in runs]
+
+    controls = [list(r['controls'].values()) for r in plain]
+    rows = [(name, *antithetic(column(plain[:n // 2], name), column(mirrored, name))) for name in measures]
+    print_reduction(f"Antithetic, {n // 2} pairs", rows)
+    rows = [(name, *control_variates(column(plain, name), controls)) for name in measures]
+    print_reduction(f"Control variates, {n} replications", rows)
+
+    if args.compare:
+        try:
+            changes = parse_space(args.compare, base)
+        except ValueError as ve:
+            parser.error(str(ve))
+        other = with_settings(base, {name: values[0] for name, values in changes.items()})
+        same_streams = run(partial(vr_replication, other, args.crn, False, 0), n)
+        own_streams = run(partial(vr_replication, other, args.crn, False, n), n)
+        rows = [(name, *common_random_numbers(column(plain, name), column(same_streams, name), column(own_streams, name)))
+                for name in measures]
+        print_reduction(f"Common random numbers ({args.crn}), difference with {' '.join(args.compare)}", rows)
+    print(f"wall time: {time.perf_counter() - start:.2f}s")
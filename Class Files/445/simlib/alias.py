@@ -0,0 +1,60 @@
+'''
+alias.py
+Walker's alias method, with Vose's construction, for drawing from a fixed
+discrete distribution in O(1) whatever its size. The table is built once:
+n columns of height 1/n, each holding at most two outcomes. A draw picks a
+column and one of its two outcomes, and both come out of a single uniform,
+its integer part after scaling by n gives the column and the fraction left
+over is the coin.
+'''
+import numpy as np
+
+
+class AliasTable:
+    """draws outcomes[k] with probability weights[k] / sum(weights)"""
+    def __init__(self, weights, outcomes=None):
+        weights = np.asarray(weights, dtype=float)
+        n = len(weights)
+        if n == 0 or np.any(weights < 0) or weights.sum() <= 0:
+            raise ValueError("an alias table needs non-negative weights with a positive sum")
+        if outcomes is None:
+            outcomes = list(range(n))
+        if len(outcomes) != n:
+            raise ValueError("an alias table needs one outcome for every weight")
+        scaled = (weights * n / weights.sum()).tolist()
+        prob = [1.0] * n
+        alias = list(range(n))
+        small = [k for k in range(n) if scaled[k] < 1.0]
+        large = [k for k in range(n) if scaled[k] >= 1.0]
+        while small and large:
+            less, more = small.pop(), large.pop()
+            prob[less] = scaled[less]
+            alias[less] = more
+            # the large column gives up what fills the small one
+            scaled[more] = scaled[more] + scaled[less] - 1.0
+            (small if scaled[more] < 1.0 else large).append(more)
+        # whatever is left is 1 up to rounding and keeps its own column
+        self.n = n
+        self.prob = prob
+        self.outcomes = list(outcomes)
+        self.aliases = [outcomes[k] for k in alias]
+        # u * n rounds up to n for u a hair under 1, the extra column
+        # repeats the last one so that never needs a check
+        self.prob.append(self.prob[-1])
+        self.outcomes.append(self.outcomes[-1])
+        self.aliases.append(self.aliases[-1])
+
+    def sample(self, u):
+        """outcome for one U(0, 1) draw"""
+        x = u * self.n
+        k = int(x)
+        if x - k < self.prob[k]:
+            return self.outcomes[k]
+        return self.aliases[k]
+
+    def sample_many(self, uniforms):
+        """numpy array of outcomes, one per uniform"""
+        x = np.asarray(uniforms, dtype=float) * self.n
+        k = x.astype(np.intp)
+        prob = np.asarray(self.prob)
+        return np.where(x - k < prob[k], np.asarray(self.outcomes)[k], np.asarray(self.aliases)[k])
@@ -0,0 +1,117 @@
+'''
+arrivals.py
+Time varying arrival rates. A profile is piecewise constant, read from a
+file of "start rate" lines (rate in arrivals per time unit), optionally
+repeating every period, e.g. 168 hourly rates over a 10080 minute week.
+Arrival times come by inversion: the epochs of a rate 1 Poisson process
+are mapped through the inverse of the cumulative intensity, so a whole
+run's arrivals are drawn in a few numpy calls.
+'''
+import math
+
+import numpy as np
+
+from rng import standard_exponentials
+
+
+class ArrivalProfile:
+    def __init__(self, starts, rates, period=None):
+        self.starts = np.asarray(starts, dtype=float)
+        self.rates = np.asarray(rates, dtype=float)
+        if len(self.starts) == 0 or len(self.starts) != len(self.rates):
+            raise ValueError("a profile needs one rate for every start time")
+        if self.starts[0] != 0 or np.any(np.diff(self.starts) <= 0):
+            raise ValueError("start times must begin at 0 and increase")
+        if np.any(self.rates < 0):
+            raise ValueError("rates can not be negative")
+        if period is not None and period <= self.starts[-1]:
+            raise ValueError("period must be after the last start time")
+        self.period = period
+        # cumulative intensity at every start time, and at the period end
+        ends = np.append(self.starts[1:], period if period is not None else math.inf)
+        widths = ends - self.starts
+        with np.errstate(invalid='ignore'):
+            pieces = np.where(self.rates > 0, self.rates * widths, 0.0)
+        self.cumulative_starts = np.concatenate(([0.0], np.cumsum(pieces)[:-1]))
+        self.period_total = float(np.sum(pieces)) if period is not None else math.inf
+
+    @classmethod
+    def load(cls, path):
+        """profile from a file of "start rate" lines, "period P" repeats it
+
+        Blank lines and anything after # are ignored.
+        """
+        starts, rates, period = [], [], None
+        with open(path) as f:
+            for line in f:
+                fields = line.split('#')[0].split()
+                if not fields:
+                    continue
+                if fields[0] == 'period':
+                    period = float(fields[1])
+                else:
+                    starts.append(float(fields[0]))
+                    rates.append(float(fields[1]))
+        return cls(starts, rates, period)
+
+    @classmethod
+    def constant(cls, rate):
+        return cls([0.0], [rate])
+
+    def rate(self, t):
+        """arrival rate at time t"""
+        if self.period is not None:
+            t = t % self.period
+        return float(self.rates[np.searchsorted(self.starts, t, 'right') - 1])
+
+    def cumulative(self, t):
+        """expected number of arrivals in [0, t]"""
+        before = 0.0
+        if self.period is not None:
+            cycles, t = divmod(t, self.period)
+            before = cycles * self.period_total
+        i = np.searchsorted(self.starts, t, 'right') - 1
+        return float(before + self.cumulative_starts[i] + self.rates[i] * (t - self.starts[i]))
+
+    def inverse(self, values):
+        """times at which the cumulative intensity reaches each of values"""
+        values = np.asarray(values, dtype=float)
+        cycles = 0.0
+        if self.period is not None:
+            cycles = np.floor(values / self.period_total)
+            values = values - cycles * self.period_total
+        # last piece whose cumulative start is below the value, pieces
+        # with rate 0 have no width in intensity and are never picked
+        i = np.searchsorted(self.cumulative_starts, values, 'right') - 1
+        rates = self.rates[i]
+        with np.errstate(divide='ignore', invalid='ignore'):
+            offsets = np.where(rates > 0, (values - self.cumulative_starts[i]) / rates, math.inf)
+        times = self.starts[i] + offsets
+        if self.period is not None:
+            times = times + cycles * self.period
+        return times
+
+    def arrivals(self, end_time, generator, antithetic=False, start=0.0):
+        """sorted array of every arrival time after start and before end_time
+
+        generator is a numpy Generator, its uniforms (1 - u if antithetic)
+        give the exponential gaps of the rate 1 process that gets mapped
+        through inverse().
+        """
+        offset = self.cumulative(start) if start > 0 else 0.0
+        total = self.cumulative(end_time) - offset
+        if total <= 0:
+            return np.empty(0)
+
+        def gaps(size):
+            uniforms = generator.random(size)
+            return standard_exponentials(1.0 - uniforms if antithetic else uniforms)
+
+        # enough gaps for all but a tiny fraction of runs in one draw
+        size = int(total + 6 * math.sqrt(total) + 16)
+        epochs = np.cumsum(gaps(size))
+        while epochs[-1] < total:
+            epochs = np.concatenate((epochs, np.cumsum(gaps(size)) + epochs[-1]))
+        epochs = epochs[:np.searchsorted(epochs, total)]
+        times = self.inverse(epochs + offset)
+        return times[times < end_time]
@@ -0,0 +1,63 @@
+'''
+bench_eventlist.py
+Classic hold model for the future event list: keep n events pending, then
+repeatedly pop the next one and schedule a replacement a random time later.
+Reports ns per hold for EventList and for a bare heapq of tuples, so the
+cost the calendar adds on top of the heap is visible.
+usage: python3 bench_eventlist.py [holds] [csv_log]
+'''
+import csv
+import heapq
+import random
+import sys
+import time
+from datetime import datetime
+
+from eventlist import EventList
+
+
+def hold_eventlist(n, holds, seed=1):
+    rng = random.Random(seed)
+    events = EventList()
+    for i in range(n):
+        events.schedule(rng.random(), 0, i)
+    start = time.perf_counter()
+    for _ in range(holds):
+        clock, _, event_type, data = events.pop()
+        events.schedule(clock + rng.random(), event_type, data)
+    return (time.perf_counter() - start) * 1e9 / holds
+
+
+def hold_heapq(n, holds, seed=1):
+    rng = random.Random(seed)
+    heap = []
+    seq = 0
+    for i in range(n):
+        heapq.heappush(heap, (rng.random(), seq, 0, i))
+        seq += 1
+    start = time.perf_counter()
+    for _ in range(holds):
+        clock, _, event_type, data = heapq.heappop(heap)
+        heapq.heappush(heap, (clock + rng.random(), seq, event_type, data))
+        seq += 1
+    return (time.perf_counter() - start) * 1e9 / holds
+
+
+if __name__ == '__main__':
+    holds = int(sys.argv[1]) if len(sys.argv) > 1 else 200000
+    log = sys.argv[2] if len(sys.argv) > 2 else None
+
+    rows = []
+    print(f"{'pending':>8} {'EventList ns':>13} {'heapq ns':>9} {'overhead':>9}")
+    for n in (10, 1000, 100000):
+        calendar = hold_eventlist(n, holds)
+        bare = hold_heapq(n, holds)
+        rows.append((n, calendar, bare))
+        print(f"{n:>8} {calendar:>13.0f} {bare:>9.0f} {calendar - bare:>9.0f}")
+
+    if log:
+        stamp = datetime.now().isoformat(timespec="seconds")
+        with open(log, "a", newline="") as f:
+            writer = csv.writer(f)
+            for n, calendar, bare in rows:
+                writer.writerow([stamp, n, f"{calendar:.1f}", f"{bare:.1f}"])
@@ -0,0 +1,61 @@
+'''
+bench_rng.py
+Per draw cost of the variate sources used by the simulators: the old
+one-at-a-time calls (GPT2's exponential() on the random module,
+random.Random.expovariate in the SSES drivers, a scalar numpy Generator
+call) against BufferedStream handing out pre-drawn blocks. Also checks
+that a BufferedStream gives the same sequence for every block size.
+usage: python3 bench_rng.py [draws]
+'''
+import math
+import random
+import sys
+import time
+
+import numpy as np
+
+from rng import BufferedStream, RandomStreams
+
+
+def per_draw(draw, n):
+    """best of three, in ns per call"""
+    best = float('inf')
+    for _ in range(3):
+        start = time.perf_counter()
+        for _ in range(n):
+            draw()
+        best = min(best, time.perf_counter() - start)
+    return best * 1e9 / n
+
+
+def same_for_any_block_size(n=10000):
+    """mixed uniform/exponential draws must not depend on block_size"""
+    runs = []
+    for block_size in (1, 7, 256, 4096):
+        stream = BufferedStream(RandomStreams(1).generator("check"),
+                                block_size)
+        runs.append([stream.exponential(2.0) if i % 3 else stream.random()
+                     for i in range(n)])
+    return all(run == runs[0] for run in runs[1:])
+
+
+if __name__ == '__main__':
+    n = int(sys.argv[1]) if len(sys.argv) > 1 else 1000000
+    mean = 6.0
+    rate = 1 / mean
+    stdlib = random.Random(1)
+    generator = np.random.default_rng(1)
+    buffered = RandomStreams(1).stream("bench")
+
+    rows = [
+        ("-mean*log(random.random())", lambda: -mean * math.log(random.random())),
+        ("random.Random.expovariate", lambda: stdlib.expovariate(rate)),
+        ("Generator.exponential scalar", lambda: generator.exponential(mean)),
+        ("BufferedStream.exponential", lambda: buffered.exponential(mean)),
+        ("random.Random.random", stdlib.random),
+        ("Generator.random scalar", generator.random),
+        ("BufferedStream.random", buffered.random),
+    ]
+    for name, draw in rows:
+        print(f"{name:<30} {per_draw(draw, n):7.1f} ns/draw")
+    print(f"same stream for every block size: {same_for_any_block_size()}")
@@ -0,0 +1,55 @@
+'''
+disciplines.py
+Waiting lines for queue disciplines other than first in, first out. A
+PriorityLine has the append/popleft interface of the deque the FIFO lines
+use, so a station can swap one in without the model code changing, and
+keeps its entries on a binary heap so both operations are O(log n).
+'''
+import heapq
+from itertools import count
+
+# discipline name -> what decides the order in line
+DISCIPLINES = {
+    "fifo": "order of arrival",
+    "priority": "priority class, then order of arrival",
+    "preemptive": "priority class, a better class takes the server over "
+                  "and the patient it replaces resumes later",
+    "sept": "shortest expected remaining service, then order of arrival",
+}
+
+
+class PriorityLine:
+    """line of (entity, arrival_time) items served lowest key first
+
+    key(entity) gives the sort key of an entity when it joins. Equal keys
+    go by arrival_time and then by the order they joined, so a line with
+    a constant key behaves exactly like a FIFO deque.
+    """
+    def __init__(self, key):
+        self.key = key
+        self._heap = []
+        self._counter = count()
+
+    def __len__(self):
+        return len(self._heap)
+
+    def append(self, item):
+        heapq.heappush(self._heap, (self.key(item[0]), item[1],
+                                    next(self._counter), item))
+
+    def popleft(self):
+        return heapq.heappop(self._heap)[3]
+
+    def clear(self):
+        self._heap.clear()
+
+    def __getstate__(self):
+        following = next(self._counter)
+        self._counter = count(following)
+        state = self.__dict__.copy()
+        state["_counter"] = following
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._counter = count(state["_counter"])
@@ -0,0 +1,71 @@
+'''
+eventlist.py
+Future event list shared by the simulators. Events sit on a binary heap as
+(time, seq, event_type, data) tuples, so scheduling and removal are
+O(log n), and the sequence number breaks ties in the order the events were
+scheduled.
+'''
+import heapq
+from itertools import count
+
+
+class EventList:
+    def __init__(self):
+        self._heap = []
+        self._counter = count()
+        # sequence numbers of cancelled events still sitting on the heap
+        self._cancelled = set()
+
+    def __len__(self):
+        return len(self._heap) - len(self._cancelled)
+
+    def __bool__(self):
+        return len(self._heap) > len(self._cancelled)
+
+    def schedule(self, time, event_type, data=None):
+        """adds an event and returns a handle that can be passed to cancel()"""
+        seq = next(self._counter)
+        heapq.heappush(self._heap, (time, seq, event_type, data))
+        return seq
+
+    def cancel(self, handle):
+        """drops a pending event, it is skipped when it reaches the top"""
+        self._cancelled.add(handle)
+
+    def pop(self):
+        """removes and returns the next (time, seq, event_type, data)"""
+        heap = self._heap
+        event = heapq.heappop(heap)
+        if self._cancelled:
+            while event[1] in self._cancelled:
+                self._cancelled.discard(event[1])
+                event = heapq.heappop(heap)
+        return event
+
+    def push(self, event):
+        """puts back an event taken with pop(), keeping its place in ties"""
+        heapq.heappush(self._heap, event)
+
+    def peek_time(self):
+        """time of the next event, inf when the list is empty"""
+        heap = self._heap
+        while heap and heap[0][1] in self._cancelled:
+            self._cancelled.discard(heapq.heappop(heap)[1])
+        return heap[0][0] if heap else float('inf')
+
+    def clear(self):
+        self._heap.clear()
+        self._cancelled.clear()
+
+    def __getstate__(self):
+        # the counter is stored as the next sequence number, pickling
+        # itertools.count is deprecated
+        following = next(self._counter)
+        self._counter = count(following)
+        state = self.__dict__.copy()
+        state["_counter"] = following
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self._counter = count(state["_counter"])
@@ -0,0 +1,86 @@
+'''
+eventtrace.py
+Columnar record of what happened to every customer: arrival at a station,
+service start and departure. Records go into preallocated typed arrays and
+each full chunk is written straight to one .npy file per column, so a run
+of millions of events is written at close to disk speed and loads back
+with np.load (memory mapped if wanted) without any parsing.
+'''
+import os
+from array import array
+
+import numpy as np
+
+ARRIVE = 0
+START = 1
+DEPART = 2
+KIND_NAMES = ["arrive", "start", "depart"]
+
+# column name -> array typecode
+COLUMNS = {"time": "d", "kind": "B", "station": "H", "entity": "q"}
+
+# every column file starts with a fixed size .npy header, rewritten on close
+HEADER_SIZE = 128
+
+
+def npy_header(typecode, count):
+    """version 1.0 .npy header for a 1-d array, padded to HEADER_SIZE bytes"""
+    header = repr({"descr": np.dtype(typecode).str, "fortran_order": False,
+                   "shape": (count,)})
+    header = header.ljust(HEADER_SIZE - 10 - 1) + "\n"
+    return (b"\x93NUMPY\x01\x00" + len(header).to_bytes(2, "little")
+            + header.encode("latin1"))
+
+
+class TraceWriter:
+    def __init__(self, directory, chunk_size=1 << 16):
+        os.makedirs(directory, exist_ok=True)
+        self.directory = directory
+        self.chunk_size = chunk_size
+        self.count = 0
+        self.index = 0
+        self.columns = {}
+        self.files = {}
+        for name, typecode in COLUMNS.items():
+            self.columns[name] = array(typecode, bytes(
+                array(typecode).itemsize * chunk_size))
+            self.files[name] = open(os.path.join(directory, name + ".npy"), "wb")
+            self.files[name].write(npy_header(typecode, 0))
+        self.times = self.columns["time"]
+        self.kinds = self.columns["kind"]
+        self.stations = self.columns["station"]
+        self.entities = self.columns["entity"]
+
+    def record(self, time, kind, station, entity):
+        index = self.index
+        self.times[index] = time
+        self.kinds[index] = kind
+        self.stations[index] = station
+        self.entities[index] = entity
+        index += 1
+        if index == self.chunk_size:
+            self.index = index
+            self.flush()
+        else:
+            self.index = index
+
+    def flush(self):
+        """writes the filled part of every column and starts a new chunk"""
+        for name, column in self.columns.items():
+            self.files[name].write(memoryview(column)[:self.index])
+        self.count += self.index
+        self.index = 0
+
+    def close(self):
+        self.flush()
+        for name, f in self.files.items():
+            f.seek(0)
+            f.write(npy_header(COLUMNS[name], self.count))
+            f.close()
+
+
+def load_trace(directory, mmap_mode=None):
+    """dict of column name -> numpy array"""
+    return {name: np.load(os.path.join(directory, name + ".npy"),
+                          mmap_mode=mmap_mode)
+            for name in COLUMNS}
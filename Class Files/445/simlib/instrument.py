@@ -0,0 +1,122 @@
+'''
+instrument.py
+Opt-in counters for the event loops: events handled per type, events per
+second, the event list's high-water mark, each station's longest line,
+and where the time went (drawing random numbers, statistics, handlers,
+the event list). A model given an Instruments runs a separate, timed copy
+of its loop, so a run without one pays nothing per event. The timers
+around every call slow the run down themselves, the split is a guide to
+where time goes, not the speed of an uninstrumented run.
+'''
+import json
+import time
+
+# where the time of an instrumented run is booked
+BUCKETS = ("rng", "stats", "handlers", "event_list")
+
+
+class Timed:
+    """calls function and books the time it took under bucket"""
+    def __init__(self, function, seconds, bucket):
+        self.function = function
+        self.seconds = seconds
+        self.bucket = bucket
+
+    def __call__(self, *args):
+        start = time.perf_counter()
+        try:
+            return self.function(*args)
+        finally:
+            self.seconds[self.bucket] += time.perf_counter() - start
+
+
+class TimedStream:
+    """random stream whose draws are booked as rng time"""
+    def __init__(self, stream, seconds):
+        self.stream = stream
+        self.seconds = seconds
+
+    def random(self):
+        start = time.perf_counter()
+        value = self.stream.random()
+        self.seconds["rng"] += time.perf_counter() - start
+        return value
+
+    def exponential(self, mean):
+        start = time.perf_counter()
+        value = self.stream.exponential(mean)
+        self.seconds["rng"] += time.perf_counter() - start
+        return value
+
+    def __getattr__(self, name):
+        return getattr(self.stream, name)
+
+
+class Instruments:
+    """counters of one or more instrumented runs of a model
+
+    The model calls bind() with its event type and station names before
+    the first event; later runs of the same model add to the counts.
+    rng and stats time is spent inside the handlers, handlers is booked
+    without it.
+    """
+    def __init__(self):
+        self.event_names = []
+        self.station_names = []
+        self.events = []
+        self.queue_high_water = []
+        self.heap_high_water = 0
+        self.seconds = dict.fromkeys(BUCKETS, 0.0)
+        self.wall = 0.0
+
+    def bind(self, event_names, station_names=()):
+        if not self.event_names:
+            self.event_names = list(event_names)
+            self.station_names = list(station_names)
+            self.events = [0] * len(self.event_names)
+            self.queue_high_water = [0] * len(self.station_names)
+        elif list(event_names) != self.event_names:
+            raise ValueError("these instruments already count another model's events")
+
+    def timed(self, function, bucket):
+        return Timed(function, self.seconds, bucket)
+
+    def timed_stream(self, stream):
+        return TimedStream(stream, self.seconds)
+
+    def as_dict(self):
+        total = sum(self.events)
+        seconds = dict(self.seconds)
+        seconds["handlers"] = max(0.0, seconds["handlers"] - seconds["rng"] - seconds["stats"])
+        seconds["other"] = max(0.0, self.wall - sum(seconds.values()))
+        return {
+            "events": dict(zip(self.event_names, self.events)),
+            "events_total": total,
+            "wall_seconds": self.wall,
+            "events_per_second": total / self.wall if self.wall > 0 else 0.0,
+            "heap_high_water": self.heap_high_water,
+            "queue_high_water": dict(zip(self.station_names, self.queue_high_water)),
+            "seconds": seconds,
+        }
+
+    def to_json(self, path=None):
+        """the counters as JSON text, also written to path if given"""
+        text = json.dumps(self.as_dict(), indent=2)
+        if path is not None:
+            with open(path, "w") as f:
+                f.write(text + "\n")
+        return text
+
+    def report(self, file=None):
+        counters = self.as_dict()
+        print(f"=== Instruments: {counters['events_total']} events in "
+              f"{counters['wall_seconds']:.3f}s, "
+              f"{counters['events_per_second']:,.0f} events/s ===", file=file)
+        for name, count in counters["events"].items():
+            print(f"{name:<20} {count:>12}", file=file)
+        print(f"event list high-water mark {counters['heap_high_water']}", file=file)
+        for name, length in counters["queue_high_water"].items():
+            print(f"longest line at {name:<12} {length}", file=file)
+        wall = counters["wall_seconds"] or 1.0
+        for bucket, seconds in counters["seconds"].items():
+            print(f"{bucket:<12} {seconds:8.3f}s {seconds / wall:6.1%}", file=file)
@@ -0,0 +1,302 @@
+'''
+network.py
+Declarative queueing network models. A model names its stations (servers,
+service time distribution, queue discipline, optional acuity class) and
+where a customer goes after each one, in JSON, TOML or YAML:
+
+    {"end_time": 10080,
+     "arrivals": {"to": "triage", "mean": 6.0},
+     "stations": {
+         "triage": {"servers": 1, "service": 7.0,
+                    "routing": {"exit": 0.1, "trauma": 0.9}},
+         "trauma": {"servers": 1, "acuity": 1,
+                    "service": {"distribution": "erlang", "mean": 180, "k": 3}}}}
+
+A bare number as the service is an exponential mean, a station without
+routing sends everyone out. compile_network() checks the model and numbers
+the stations 0..n-1 in the order given, so a simulator only ever indexes
+lists; column n of the routing table is leaving the system, and each row
+with more than one destination gets an alias table to draw from.
+'''
+import json
+import math
+import os
+from functools import partial
+from statistics import NormalDist
+
+import numpy as np
+
+from alias import AliasTable
+from disciplines import DISCIPLINES
+
+EXIT = "exit"
+
+# distribution -> the parameters it needs
+DISTRIBUTIONS = {
+    "exponential": ("mean",),
+    "erlang": ("mean", "k"),
+    "uniform": ("low", "high"),
+    "deterministic": ("mean",),
+    "lognormal": ("mean", "sd"),
+}
+
+DEFAULT_DISCIPLINE = "fifo"
+
+
+def load_network(path):
+    """model spec dict from a .json, .toml or .yaml/.yml file
+
+    An arrival profile file named in the model is taken relative to the
+    model file.
+    """
+    extension = os.path.splitext(path)[1].lower()
+    if extension == ".json":
+        with open(path) as f:
+            spec = json.load(f)
+    elif extension == ".toml":
+        import tomllib
+        with open(path, "rb") as f:
+            spec = tomllib.load(f)
+    elif extension in (".yaml", ".yml"):
+        try:
+            import yaml
+        except ImportError:
+            raise ImportError("YAML models need PyYAML (pip install pyyaml), "
+                              "JSON and TOML work without it") from None
+        with open(path) as f:
+            spec = yaml.safe_load(f)
+    else:
+        raise ValueError(f"Unknown model format {extension}, use .json, .toml or .yaml")
+    profile = spec.get("arrivals", {}).get("profile")
+    if profile and not os.path.isabs(profile):
+        spec["arrivals"]["profile"] = os.path.join(os.path.dirname(path), profile)
+    return spec
+
+
+def service_spec(service):
+    """service entry with the distribution and all its parameters filled in"""
+    if isinstance(service, (int, float)):
+        service = {"mean": service}
+    service = dict(service)
+    distribution = service.setdefault("distribution", "exponential")
+    if distribution not in DISTRIBUTIONS:
+        raise ValueError(f"Unknown distribution {distribution}, expected one of {', '.join(DISTRIBUTIONS)}")
+    for parameter in DISTRIBUTIONS[distribution]:
+        if parameter not in service:
+            raise ValueError(f"{distribution} service needs {parameter}")
+    return service
+
+
+def service_mean(service):
+    if service["distribution"] == "uniform":
+        return (service["low"] + service["high"]) / 2
+    return service["mean"]
+
+
+class ServiceTime:
+    """service time sampler of one station on its own stream"""
+    def __init__(self, stream, service):
+        self.stream = stream
+        self.mean = service_mean(service)
+        self.k = int(service.get("k", 1))
+        self.low = service.get("low", 0.0)
+        self.high = service.get("high", 0.0)
+        if service["distribution"] == "lognormal":
+            sigma2 = math.log(1 + (service["sd"] / self.mean) ** 2)
+            self.mu = math.log(self.mean) - sigma2 / 2
+            self.sigma = math.sqrt(sigma2)
+
+    def erlang(self):
+        phase = self.mean / self.k
+        return sum(self.stream.exponential(phase) for _ in range(self.k))
+
+    def uniform(self):
+        return self.low + (self.high - self.low) * self.stream.random()
+
+    def deterministic(self):
+        return self.mean
+
+    def lognormal(self):
+        u = max(self.stream.random(), 1e-300)
+        return math.exp(self.mu + self.sigma * NormalDist().inv_cdf(u))
+
+
+def make_sampler(stream, service):
+    """function of no arguments returning the next service time"""
+    if service["distribution"] == "exponential":
+        # straight to the stream, no extra Python frame per draw
+        return partial(stream.exponential, service["mean"])
+    return getattr(ServiceTime(stream, service), service["distribution"])
+
+
+class Network:
+    """a checked model with its stations numbered 0..n-1"""
+    def __init__(self, spec):
+        self.spec = spec
+        stations = spec.get("stations")
+        if not stations:
+            raise ValueError("a model needs at least one station")
+        self.names = list(stations)
+        self.ids = {name: i for i, name in enumerate(self.names)}
+        self.n = len(self.names)
+        self.exit = self.n
+        self.end_time = float(spec.get("end_time", spec.get("simulation_end_time", 0)))
+
+        arrivals = spec.get("arrivals", {})
+        entry = arrivals.get("to", self.names[0])
+        if entry not in self.ids:
+            raise ValueError(f"arrivals go to unknown station {entry}")
+        self.entry = self.ids[entry]
+        self.arrival_mean = arrivals.get("mean")
+        self.arrival_profile = arrivals.get("profile")
+        if self.arrival_mean is None and self.arrival_profile is None:
+            raise ValueError("arrivals need a mean inter-arrival time or a profile")
+
+        self.servers = []
+        self.services = []
+        self.service_means = []
+        self.disciplines = []
+        self.acuity = []
+        # routing[i, j] is the chance of going from i to j, j == n is leaving
+        self.routing = np.zeros((self.n, self.n + 1))
+        for i, name in enumerate(self.names):
+            station = stations[name]
+            self.servers.append(int(station.get("servers", 1)))
+            service = service_spec(station.get("service", 1.0))
+            self.services.append(service)
+            self.service_means.append(service_mean(service))
+            discipline = station.get("discipline", DEFAULT_DISCIPLINE)
+            if discipline not in DISCIPLINES:
+                raise ValueError(f"Unknown discipline {name}={discipline}, disciplines are {', '.join(DISCIPLINES)}")
+            self.disciplines.append(discipline)
+            self.acuity.append(station.get("acuity"))
+            for target, p in station.get("routing", {EXIT: 1.0}).items():
+                if target != EXIT and target not in self.ids:
+                    raise ValueError(f"{name} routes to unknown station {target}")
+                if p < 0:
+                    raise ValueError(f"{name} -> {target} has a negative probability")
+                self.routing[i, self.exit if target == EXIT else self.ids[target]] += p
+            total = self.routing[i].sum()
+            if abs(total - 1) > 1e-9:
+                raise ValueError(f"routing out of {name} adds up to {total}, not 1")
+
+        # destinations with a chance, and an alias table over them for
+        # stations with more than one, so a routing draw is O(1)
+        self.targets = []
+        self.alias_tables = []
+        for i in range(self.n):
+            targets = [j for j in range(self.n + 1) if self.routing[i, j] > 0]
+            self.targets.append(targets)
+            self.alias_tables.append(AliasTable(self.routing[i, targets], targets) if len(targets) > 1 else None)
+        self.check_exit()
+
+        classes = [a for a in self.acuity if a is not None]
+        # customers whose path has no acuity station come last
+        self.exit_class = max(classes, default=0) + 1
+        self.classes = self.possible_classes()
+
+    def check_exit(self):
+        """every station has to have a way out of the network"""
+        leaves = {i for i in range(self.n) if self.routing[i, self.exit] > 0}
+        changed = True
+        while changed:
+            changed = False
+            for i in range(self.n):
+                if i not in leaves and any(j in leaves for j in self.targets[i]):
+                    leaves.add(i)
+                    changed = True
+        stuck = [self.names[i] for i in range(self.n) if i not in leaves]
+        if stuck:
+            raise ValueError(f"customers can never leave from {', '.join(stuck)}")
+
+    def possible_classes(self):
+        """sorted acuity classes of the customers each station can see
+
+        A customer's class is the acuity of the first station with one on
+        their whole path, so it is known on arrival once the path is drawn.
+        """
+        # classes decided by the path from a station on
+        ahead = [set() for _ in range(self.n)]
+        changed = True
+        while changed:
+            changed = False
+            for i in range(self.n):
+                if self.acuity[i] is not None:
+                    found = {self.acuity[i]}
+                else:
+                    found = set()
+                    for j in self.targets[i]:
+                        found |= {self.exit_class} if j == self.exit else ahead[j]
+                if found - ahead[i]:
+                    ahead[i] |= found
+                    changed = True
+        # classes already decided on the way to a station, None if not yet
+        behind = [set() for _ in range(self.n)]
+        behind[self.entry].add(None)
+        changed = True
+        while changed:
+            changed = False
+            for i in range(self.n):
+                for c in list(behind[i]):
+                    passed = c if c is not None else self.acuity[i]
+                    for j in self.targets[i]:
+                        if j != self.exit and passed not in behind[j]:
+                            behind[j].add(passed)
+                            changed = True
+        return [sorted({c for c in behind[i] if c is not None}
+                       | (ahead[i] if None in behind[i] else set()))
+                for i in range(self.n)]
+
+
+def compile_network(spec):
+    return Network(spec)
+
+
+# settings of a station, as the suffix after its name
+STATION_SETTINGS = ("servers", "service_mean")
+
+
+def split_setting(name, stations):
+    """(station, setting) of a <station>_servers or <station>_service_mean
+    name, station names may have underscores of their own"""
+    for setting in STATION_SETTINGS:
+        station = name[:-len(setting) - 1]
+        if name.endswith("_" + setting) and station in stations:
+            return station, setting
+    raise ValueError(f"Unknown setting {name}, expected end_time, arrival_mean, "
+                     f"<station>_servers or <station>_service_mean")
+
+
+def get_setting(spec, name):
+    """current value of a flat setting of spec, as apply_settings names it"""
+    if name in ("end_time", "simulation_end_time"):
+        return spec.get("end_time", spec.get("simulation_end_time"))
+    if name == "arrival_mean":
+        return spec.get("arrivals", {}).get("mean")
+    station, setting = split_setting(name, spec["stations"])
+    if setting == "servers":
+        return spec["stations"][station].get("servers", 1)
+    return service_mean(service_spec(spec["stations"][station].get("service", 1.0)))
+
+
+def apply_settings(spec, changes):
+    """copy of spec with flat settings changed: end_time,
+    arrival_mean and <station>_servers / <station>_service_mean"""
+    spec = json.loads(json.dumps(spec))
+    stations = spec["stations"]
+    for name, value in changes.items():
+        if name in ("end_time", "simulation_end_time"):
+            spec["end_time"] = value
+        elif name == "arrival_mean":
+            spec.setdefault("arrivals", {})["mean"] = value
+        else:
+            station, setting = split_setting(name, stations)
+            if setting == "servers":
+                stations[station]["servers"] = value
+            else:
+                service = service_spec(stations[station].get("service", 1.0))
+                if "mean" not in service:
+                    raise ValueError(f"{station} service has no mean to change")
+                service["mean"] = value
+                stations[station]["service"] = service
+    return spec
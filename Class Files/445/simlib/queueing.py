@@ -0,0 +1,39 @@
+'''
+queueing.py
+Closed form steady state measures of the M/M/c queue. In an open Jackson
+network (Poisson arrivals, exponential service, random routing) each
+station behaves like an M/M/c queue fed at its total arrival rate, so the
+same formulas give every station of such a network.
+'''
+import math
+
+
+def erlang_c(servers, offered):
+    """probability an arrival has to wait, offered load a = lambda / mu"""
+    # Erlang B by its recursion, stable for any number of servers
+    b = 1.0
+    for k in range(1, servers + 1):
+        b = offered * b / (k + offered * b)
+    rho = offered / servers
+    return b / (1 - rho * (1 - b))
+
+
+def mmc(arrival_rate, service_mean, servers):
+    """dict of rho, Lq, Wq, L and W for an M/M/c queue
+
+    A station with rho >= 1 has no steady state, its rho is still given
+    and the queue measures are inf.
+    """
+    servers = int(servers)
+    offered = arrival_rate * service_mean
+    rho = offered / servers if servers > 0 else math.inf
+    if rho >= 1:
+        return {"rho": rho, "Lq": math.inf, "Wq": math.inf,
+                "L": math.inf, "W": math.inf}
+    if arrival_rate == 0:
+        return {"rho": 0.0, "Lq": 0.0, "Wq": 0.0, "L": 0.0, "W": service_mean}
+    wait_prob = erlang_c(servers, offered)
+    lq = wait_prob * rho / (1 - rho)
+    wq = lq / arrival_rate
+    return {"rho": rho, "Lq": lq, "Wq": wq, "L": lq + offered,
+            "W": wq + service_mean}
@@ -0,0 +1,90 @@
+'''
+replications.py
+Runs independent replications of a simulation over a process pool and
+summarizes each output measure with a t confidence interval.
+'''
+import math
+import os
+from concurrent.futures import ProcessPoolExecutor
+from statistics import NormalDist
+
+import numpy as np
+
+
+def replication_seed(seed, index):
+    """child SeedSequence for one replication, for models seeded by integer"""
+    return np.random.SeedSequence(seed, spawn_key=(index,))
+
+
+def seed_int(seed_seq):
+    """128 bit integer for seeding random.Random from a SeedSequence"""
+    words = seed_seq.generate_state(4, dtype=np.uint32)
+    return int.from_bytes(words.tobytes(), "little")
+
+
+def _run_one(args):
+    task, seed, index = args
+    return task(seed, index)
+
+
+def replicate(task, n, seed=12345, workers=None):
+    """runs task(seed, index) for index 0..n-1 and returns the result dicts
+
+    task must be a module level function (or a functools.partial of one) so
+    it can be sent to the worker processes. It should draw from
+    RandomStreams(seed, replication=index), or from replication_seed() for
+    models built on random.Random, so the replications never share a stream.
+    """
+    jobs = [(task, seed, i) for i in range(n)]
+    if workers is None:
+        workers = os.cpu_count() or 1
+    if workers <= 1 or n == 1:
+        return [_run_one(job) for job in jobs]
+
+    # hand each worker a few large chunks so the pool overhead stays small
+    chunksize = max(1, n // (workers * 4))
+    with ProcessPoolExecutor(max_workers=workers) as pool:
+        return list(pool.map(_run_one, jobs, chunksize=chunksize))
+
+
+def t_quantile(p, df):
+    """quantile of Student's t with df degrees of freedom"""
+    if df == 1:
+        return math.tan(math.pi * (p - 0.5))
+    if df == 2:
+        return (2 * p - 1) / math.sqrt(2 * p * (1 - p))
+    # Cornish-Fisher expansion around the normal quantile
+    z = NormalDist().inv_cdf(p)
+    g1 = (z ** 3 + z) / 4
+    g2 = (5 * z ** 5 + 16 * z ** 3 + 3 * z) / 96
+    g3 = (3 * z ** 7 + 19 * z ** 5 + 17 * z ** 3 - 15 * z) / 384
+    g4 = (79 * z ** 9 + 776 * z ** 7 + 1482 * z ** 5 - 1920 * z ** 3
+          - 945 * z) / 92160
+    return z + g1 / df + g2 / df ** 2 + g3 / df ** 3 + g4 / df ** 4
+
+
+def confidence_interval(values, confidence=0.95):
+    """mean and t based half width of a list of replication outputs"""
+    n = len(values)
+    mean = sum(values) / n
+    if n < 2:
+        return mean, float('inf')
+    var = sum((v - mean) ** 2 for v in values) / (n - 1)
+    t = t_quantile(0.5 + confidence / 2, n - 1)
+    return mean, t * math.sqrt(var / n)
+
+
+def summarize(results, confidence=0.95):
+    """per measure (mean, half width) over a list of replication dicts"""
+    summary = {}
+    for name in results[0]:
+        values = [r[name] for r in results]
+        summary[name] = confidence_interval(values, confidence)
+    return summary
+
+
+def print_summary(summary, n, confidence=0.95):
+    print(f"=== {n} Replications, {confidence:.0%} Confidence Intervals ===")
+    width = max(len(name) for name in summary)
+    for name, (mean, half) in summary.items():
+        print(f"{name:<{width}}  {mean:12.4f} +/- {half:.4f}")
@@ -0,0 +1,123 @@
+'''
+resultcache.py
+Finished run results kept in a local SQLite file, so a run that has been
+done before (same configuration, seed, replication and model code) comes
+back without simulating. Entries are stored as JSON and the least recently
+used ones are dropped once the file passes its size limit. Hits are only
+noted in memory and written in batches, so a get() writes nothing; close()
+writes out what is pending. The size is a running total kept in a row of
+its own and changed in the same transaction as the entries, so a put()
+never sums the whole table and every process sharing the file evicts
+against the same total.
+'''
+import hashlib
+import json
+import sqlite3
+import time
+
+
+def source_version(*paths):
+    """hash of the given source files, changes whenever any of them is edited"""
+    digest = hashlib.sha256()
+    for path in paths:
+        with open(path, "rb") as f:
+            digest.update(f.read())
+    return digest.hexdigest()[:16]
+
+
+class ResultCache:
+    def __init__(self, path, version="", max_bytes=64 << 20, flush_every=256):
+        self.path = path
+        self.version = version
+        self.max_bytes = max_bytes
+        self.flush_every = flush_every
+        self.hits = 0
+        self.misses = 0
+        # key -> last used time of hits not written yet
+        self.touched = {}
+        self.db = sqlite3.connect(path, timeout=30)
+        self.db.execute("CREATE TABLE IF NOT EXISTS results ("
+                        "key TEXT PRIMARY KEY, value TEXT, size INTEGER, used REAL)")
+        self.db.execute("CREATE INDEX IF NOT EXISTS results_used ON results (used)")
+        self.db.execute("CREATE TABLE IF NOT EXISTS total (bytes INTEGER)")
+        self.db.execute("INSERT INTO total SELECT COALESCE(SUM(size), 0) FROM results "
+                        "WHERE NOT EXISTS (SELECT 1 FROM total)")
+        self.db.commit()
+
+    def __len__(self):
+        return self.db.execute("SELECT COUNT(*) FROM results").fetchone()[0]
+
+    def key(self, **parts):
+        """hash of everything that decides a result, plus the model version"""
+        text = json.dumps({"version": self.version, **parts}, sort_keys=True)
+        return hashlib.sha256(text.encode()).hexdigest()
+
+    def get(self, key):
+        """stored result or None, a hit marks the entry as recently used"""
+        row = self.db.execute("SELECT value FROM results WHERE key = ?",
+                              (key,)).fetchone()
+        if row is None:
+            self.misses += 1
+            return None
+        self.hits += 1
+        self.touched[key] = time.time()
+        if len(self.touched) >= self.flush_every:
+            self.flush()
+        return json.loads(row[0])
+
+    def put(self, key, value):
+        text = json.dumps(value)
+        # the write lock from the start, so no other process changes the
+        # entry or the total between reading and writing them
+        self.db.execute("BEGIN IMMEDIATE")
+        row = self.db.execute("SELECT size FROM results WHERE key = ?",
+                              (key,)).fetchone()
+        self.db.execute("INSERT OR REPLACE INTO results VALUES (?, ?, ?, ?)",
+                        (key, text, len(text), time.time()))
+        self.db.execute("UPDATE total SET bytes = bytes + ?",
+                        (len(text) - (row[0] if row else 0),))
+        self.touched.pop(key, None)
+        self.write_touched()
+        self.evict()
+        self.db.commit()
+
+    def write_touched(self):
+        """last used times of the hits so far, into the open transaction"""
+        if self.touched:
+            self.db.executemany("UPDATE results SET used = ? WHERE key = ?",
+                                [(used, key) for key, used in self.touched.items()])
+            self.touched.clear()
+
+    def flush(self):
+        self.write_touched()
+        self.db.commit()
+
+    def size(self):
+        """bytes of stored results"""
+        return self.db.execute("SELECT bytes FROM total").fetchone()[0]
+
+    def evict(self):
+        """drops least recently used entries until the size limit is met"""
+        excess = self.size() - self.max_bytes
+        if excess <= 0:
+            return
+        self.write_touched()
+        freed = 0
+        stale = []
+        for key, size in self.db.execute("SELECT key, size FROM results ORDER BY used"):
+            stale.append((key,))
+            freed += size
+            if freed >= excess:
+                break
+        self.db.executemany("DELETE FROM results WHERE key = ?", stale)
+        self.db.execute("UPDATE total SET bytes = bytes - ?", (freed,))
+
+    def clear(self):
+        self.touched.clear()
+        self.db.execute("DELETE FROM results")
+        self.db.execute("UPDATE total SET bytes = 0")
+        self.db.commit()
+
+    def close(self):
+        self.flush()
+        self.db.close()
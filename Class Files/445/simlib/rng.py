@@ -0,0 +1,156 @@
+'''
+rng.py
+Named random number streams. Every purpose in a model (arrivals, each
+station's service times, routing) gets its own PCG64 stream derived from
+one seed and the stream name, and replication r of a run jumps each stream
+r * 210306068529402873165736369884012333109 steps ahead (PCG64.jumped, a
+jump of about 0.618 * 2^128, the golden ratio share of the period), which
+spreads replications so far apart that they never overlap in practice,
+and any replication can be rerun on its own in any process. An antithetic stream hands out
+1 - u for every uniform u of the plain one, for antithetic pairs of runs.
+'''
+import random
+import zlib
+
+import numpy as np
+
+
+def standard_exponentials(uniforms):
+    """Exp(1) variates from U(0, 1) by inversion, -log(1 - u)"""
+    return np.negative(np.log1p(np.negative(uniforms)))
+
+
+def mt19937_stream(seed):
+    """numpy RandomState that produces the same uniforms as random.Random(seed)"""
+    state = random.Random(seed).getstate()[1]
+    stream = np.random.RandomState()
+    stream.set_state(("MT19937", np.array(state[:624], dtype=np.uint32),
+                      state[624]))
+    return stream
+
+
+class BufferedStream:
+    """variates drawn from a generator in blocks and handed out one at a time
+
+    Each call takes the next uniform in the stream, whether it is returned
+    as is or turned into an exponential, so the sequence a model sees only
+    depends on the seed and never on block_size.
+    """
+    def __init__(self, generator, block_size=4096, antithetic=False):
+        self.generator = generator
+        self.block_size = block_size
+        self.antithetic = antithetic
+        self.block = np.empty(0)
+        # tolist() so each draw is a plain float, not a numpy scalar
+        self.uniforms = []
+        self.exponentials = None
+        self.index = 0
+        # draws and Exp(1) total of the blocks used up, for exponential_mean
+        self.consumed = 0
+        self.consumed_total = 0.0
+
+    def refill(self):
+        self.consumed += len(self.block)
+        self.consumed_total += float(standard_exponentials(self.block).sum())
+        self.block = self.generator.random(self.block_size)
+        if self.antithetic:
+            self.block = 1.0 - self.block
+        self.uniforms = self.block.tolist()
+        # exponentials are only worked out for blocks that need them
+        self.exponentials = None
+        self.index = 0
+
+    def random(self):
+        """next U(0, 1), same interface as random.Random.random"""
+        index = self.index
+        try:
+            value = self.uniforms[index]
+        except IndexError:
+            self.refill()
+            index = 0
+            value = self.uniforms[0]
+        self.index = index + 1
+        return value
+
+    def exponential(self, mean):
+        """next exponential with the given mean"""
+        index = self.index
+        try:
+            value = self.exponentials[index]
+        except (IndexError, TypeError):
+            # end of the block, or first exponential taken from this block
+            if index == len(self.uniforms):
+                self.refill()
+                index = 0
+            self.exponentials = standard_exponentials(self.block).tolist()
+            value = self.exponentials[index]
+        self.index = index + 1
+        return value * mean
+
+    def __getstate__(self):
+        # the float lists are rebuilt from the block on restore
+        state = self.__dict__.copy()
+        state["uniforms"] = None
+        state["exponentials"] = self.exponentials is not None
+        return state
+
+    def __setstate__(self, state):
+        self.__dict__.update(state)
+        self.uniforms = self.block.tolist()
+        self.exponentials = (standard_exponentials(self.block).tolist()
+                             if state["exponentials"] else None)
+
+    def exponential_mean(self):
+        """mean of the Exp(1) variates behind every draw so far
+
+        For a fixed number of draws its expectation is exactly 1. A run
+        that stops at a time draws a number that depends on the draws, which
+        biases the mean by O(1/N) in the number of draws N, negligible for
+        a control variate over a long run. Worked out per block, so it costs
+        nothing per draw.
+        """
+        drawn = self.consumed + self.index
+        if drawn == 0:
+            return 1.0
+        partial = float(standard_exponentials(self.block[:self.index]).sum())
+        return (self.consumed_total + partial) / drawn
+
+
+class RandomStreams:
+    def __init__(self, seed=None, replication=0, block_size=4096,
+                 antithetic=False):
+        if seed is None:
+            seed = np.random.SeedSequence().entropy
+        self.seed = seed
+        self.replication = replication
+        self.block_size = block_size
+        self.antithetic = antithetic
+        self.streams = {}
+
+    def generator(self, name):
+        """numpy Generator for name, the same one for a given seed and replication"""
+        key = zlib.crc32(name.encode())
+        seed_seq = np.random.SeedSequence(self.seed, spawn_key=(key,))
+        bit_generator = np.random.PCG64(seed_seq).jumped(self.replication)
+        return np.random.Generator(bit_generator)
+
+    def reseed(self, replication):
+        """moves every stream onto another replication from its next draw"""
+        self.replication = replication
+        for name, stream in self.streams.items():
+            stream.generator = self.generator(name)
+            stream.consumed += stream.index
+            stream.consumed_total += float(
+                standard_exponentials(stream.block[:stream.index]).sum())
+            stream.block = np.empty(0)
+            stream.uniforms = []
+            stream.exponentials = None
+            stream.index = 0
+
+    def stream(self, name):
+        """buffered stream for name, created on first use"""
+        if name not in self.streams:
+            self.streams[name] = BufferedStream(self.generator(name),
+                                                self.block_size,
+                                                self.antithetic)
+        return self.streams[name]
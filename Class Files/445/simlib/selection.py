@@ -0,0 +1,85 @@
+'''
+selection.py
+Picks the best of k simulated systems with the fully sequential KN
+procedure (Kim and Nelson 2001). Every system gets n0 replications, then
+one more replication per stage goes to each system still in contention
+and a system is dropped as soon as another one is clearly better. With
+probability at least 1 - alpha the system returned is the best, or within
+delta of it. The pairwise variances are of differences, so running all
+systems on common random numbers makes the elimination much faster.
+'''
+import math
+
+import numpy as np
+
+
+def _run_sequential(jobs, simulate):
+    return [simulate(system, replication) for system, replication in jobs]
+
+
+def kn_select(k, simulate, delta, alpha=0.05, n0=10, minimize=True,
+              run_jobs=None):
+    """index of the best of k systems, and the observations behind it
+
+    simulate(system, replication) returns one scalar output. run_jobs, if
+    given, takes a list of (system, replication) pairs and returns their
+    outputs in order, so the replications of a stage can go to a process
+    pool. Returns (best, observations) where observations[i] is the list
+    of outputs taken from system i.
+    """
+    if k == 1:
+        return 0, [[]]
+    run_jobs = run_jobs or (lambda jobs: _run_sequential(jobs, simulate))
+    sign = 1.0 if minimize else -1.0
+
+    jobs = [(i, r) for i in range(k) for r in range(n0)]
+    outputs = run_jobs(jobs)
+    observations = [[] for _ in range(k)]
+    for (i, _), value in zip(jobs, outputs):
+        observations[i].append(sign * value)
+
+    eta = 0.5 * ((2 * alpha / (k - 1)) ** (-2 / (n0 - 1)) - 1)
+    h2 = 2 * eta * (n0 - 1)
+    first = np.array(observations)
+    # variance of X_i - X_l over the first stage, for every pair
+    diffs = first[:, None, :] - first[None, :, :]
+    s2 = diffs.var(axis=2, ddof=1)
+    most = int(np.max(h2 * s2 / delta ** 2))
+
+    alive = list(range(k))
+    r = n0
+    while len(alive) > 1 and r <= most:
+        means = {i: sum(observations[i]) / r for i in alive}
+        survivors = []
+        for i in alive:
+            for l in alive:
+                if l == i:
+                    continue
+                w = max(0.0, delta / (2 * r) * (h2 * s2[i, l] / delta ** 2 - r))
+                if means[i] > means[l] + w:
+                    break
+            else:
+                survivors.append(i)
+        alive = survivors
+        if len(alive) <= 1:
+            break
+        jobs = [(i, r) for i in alive]
+        for (i, _), value in zip(jobs, run_jobs(jobs)):
+            observations[i].append(sign * value)
+        r += 1
+
+    best = min(alive, key=lambda i: sum(observations[i]) / len(observations[i]))
+    return best, [[sign * x for x in obs] for obs in observations]
+
+
+def equal_allocation(k, observations, delta, alpha=0.05, n0=10):
+    """replications per system the same guarantee needs without elimination
+
+    Uses the first stage variances the KN run saw, taking every system to
+    the largest sample size any pair of systems could need.
+    """
+    eta = 0.5 * ((2 * alpha / (k - 1)) ** (-2 / (n0 - 1)) - 1)
+    h2 = 2 * eta * (n0 - 1)
+    first = np.array([obs[:n0] for obs in observations])
+    s2 = (first[:, None, :] - first[None, :, :]).var(axis=2, ddof=1)
+    return max(n0, math.ceil(np.max(h2 * s2 / delta ** 2)))
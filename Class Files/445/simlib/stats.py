@@ -0,0 +1,77 @@
+'''
+stats.py
+Streaming output statistics. Every accumulator here keeps a fixed amount
+of state no matter how many observations or how long the horizon is.
+'''
+import math
+
+
+class QuantileSketch:
+    """log bucketed histogram (DDSketch) with relative accuracy alpha
+
+    A value x lands in bucket ceil(log(x) / log(gamma)), so any quantile is
+    returned within a factor alpha of the true order statistic and the number
+    of buckets only grows with the log of the value range.
+    """
+    def __init__(self, alpha=0.01):
+        self.gamma = (1 + alpha) / (1 - alpha)
+        self.log_gamma = math.log(self.gamma)
+        self.buckets = {}
+        self.zero_count = 0
+        self.count = 0
+
+    def add(self, x):
+        self.count += 1
+        if x <= 1e-12:
+            self.zero_count += 1
+            return
+        k = math.ceil(math.log(x) / self.log_gamma)
+        self.buckets[k] = self.buckets.get(k, 0) + 1
+
+    def quantile(self, p):
+        if self.count == 0:
+            return 0.0
+        rank = p * (self.count - 1)
+        seen = self.zero_count
+        if rank < seen:
+            return 0.0
+        for k in sorted(self.buckets):
+            seen += self.buckets[k]
+            if rank < seen:
+                return 2 * self.gamma ** k / (self.gamma + 1)
+        return 2 * self.gamma ** max(self.buckets) / (self.gamma + 1)
+
+
+class Tally:
+    """running count, mean, variance (Welford), min and max of observations"""
+    def __init__(self, quantiles=False):
+        self.count = 0
+        self.mean = 0.0
+        self.m2 = 0.0
+        self.min = float('inf')
+        self.max = float('-inf')
+        self.sketch = QuantileSketch() if quantiles else None
+
+    def add(self, x):
+        self.count += 1
+        delta = x - self.mean
+        self.mean += delta / self.count
+        self.m2 += delta * (x - self.mean)
+        if x < self.min:
+            self.min = x
+        if x > self.max:
+            self.max = x
+        if self.sketch is not None:
+            self.sketch.add(x)
+
+    @property
+    def variance(self):
+        return self.m2 / (self.count - 1) if self.count > 1 else 0.0
+
+    @property
+    def stdev(self):
+        return math.sqrt(self.variance)
+
+    def quantile(self, p):
+        return self.sketch.quantile(p) if self.sketch is not None else None
+
@@ -0,0 +1,57 @@
+'''
+steady_state.py
+Output analysis for a single long run: MSER-5 warm-up detection and
+batch means confidence intervals, for plain series and for ratios such as
+a delay per customer.
+'''
+import numpy as np
+
+from replications import confidence_interval
+
+
+def mser5(values):
+    """warm-up length, in observations, picked by MSER-5
+
+    The series is averaged in groups of 5, then the cut d (at most half the
+    groups) minimising the variance of the remaining groups divided by
+    their count squared is taken.
+    """
+    groups = len(values) // 5
+    if groups < 2:
+        return 0
+    means = np.asarray(values[:groups * 5], dtype=float).reshape(groups, 5).mean(axis=1)
+    # sums over the tail means[d:] for every d at once
+    tail_sum = np.cumsum(means[::-1])[::-1]
+    tail_sq = np.cumsum(means[::-1] ** 2)[::-1]
+    kept = np.arange(groups, 0, -1)
+    statistic = (tail_sq - tail_sum ** 2 / kept) / kept ** 2
+    return int(np.argmin(statistic[:groups // 2 + 1])) * 5
+
+
+def batch_means(values, batches=20, confidence=0.95):
+    """mean and half width from the series split into equal batches"""
+    size = len(values) // batches
+    means = np.asarray(values[len(values) - size * batches:], dtype=float)
+    means = means.reshape(batches, size).mean(axis=1)
+    return confidence_interval(means.tolist(), confidence)
+
+
+def batch_ratio_means(totals, weights, batches=20, confidence=0.95):
+    """ratio estimate and half width from per interval totals and weights
+
+    For averages per customer, e.g. the total wait and the number of
+    customers served in each interval: the estimate is sum(totals) /
+    sum(weights), so every customer counts the same however busy their
+    interval was, and the half width comes from each batch's own ratio.
+    Batches without any weight are left out of the interval.
+    """
+    size = len(totals) // batches
+    start = len(totals) - size * batches
+    batch_totals = np.asarray(totals[start:], dtype=float).reshape(batches, size).sum(axis=1)
+    batch_weights = np.asarray(weights[start:], dtype=float).reshape(batches, size).sum(axis=1)
+    weight = batch_weights.sum()
+    if weight <= 0:
+        return 0.0, float('inf')
+    kept = batch_weights > 0
+    _, half_width = confidence_interval((batch_totals[kept] / batch_weights[kept]).tolist(), confidence)
+    return float(batch_totals.sum() / weight), half_width
@@ -0,0 +1,65 @@
+'''
+tracing.py
+Leveled, buffered tracing for the event loops. A Tracer is file-like, so a
+report can be printed straight into it with print(..., file=tracer); each
+finished record goes to a buffered file (or stdout) or into a ring buffer
+that only keeps the last few records. Loops check tracer.per_event before
+doing any formatting, so a disabled trace costs one attribute test.
+'''
+import sys
+from collections import deque
+
+OFF = 0
+SUMMARY = 1
+EVENT = 2
+LEVELS = {"off": OFF, "summary": SUMMARY, "event": EVENT}
+
+
+class Tracer:
+    def __init__(self, level=OFF, path=None, every=1, ring_size=0,
+                 buffer_size=1 << 16):
+        self.level = level
+        self.per_event = level >= EVENT
+        self.every = every
+        self.countdown = every
+        self.ring = deque(maxlen=ring_size) if ring_size else None
+        self.path = path
+        if path is not None:
+            self.out = open(path, "w", buffering=buffer_size)
+        else:
+            self.out = sys.stdout
+        self.parts = []
+
+    def sample(self):
+        """true on every Nth call, N = every"""
+        self.countdown -= 1
+        if self.countdown:
+            return False
+        self.countdown = self.every
+        return True
+
+    def write(self, text):
+        self.parts.append(text)
+
+    def flush(self):
+        pass
+
+    def end_record(self):
+        """closes the text written since the last record"""
+        record = "".join(self.parts)
+        self.parts.clear()
+        if self.ring is not None:
+            self.ring.append(record)
+        else:
+            self.out.write(record)
+
+    def close(self):
+        """writes out the ring buffer, if any, and the open file"""
+        if self.parts:
+            self.end_record()
+        if self.ring is not None:
+            self.out.writelines(self.ring)
+            self.ring.clear()
+        self.out.flush()
+        if self.path is not None:
+            self.out.close()
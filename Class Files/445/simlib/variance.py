@@ -0,0 +1,86 @@
+'''
+variance.py
+Estimators for variance reduction across replications: antithetic pairs,
+control variates with known means, and common random number comparisons,
+each with the factor by which it cuts the variance of the estimate against
+independent replications of the same total number of runs.
+'''
+import math
+
+import numpy as np
+
+from replications import confidence_interval, t_quantile
+
+
+def _variance_of_mean(values):
+    values = np.asarray(values, dtype=float)
+    return values.var(ddof=1) / len(values)
+
+
+def _reduction(independent, reduced):
+    """independent / reduced, inf once reduced is down to rounding noise"""
+    if reduced <= independent * 1e-12:
+        return float('inf')
+    return independent / reduced
+
+
+def antithetic(plain, mirrored, confidence=0.95):
+    """mean, half width and variance reduction from antithetic pairs
+
+    plain[i] and mirrored[i] come from the same replication streams, the
+    second with every uniform u replaced by 1 - u. The reduction compares
+    the pair averages against 2n independent runs, estimated from the
+    spread of the plain runs alone.
+    """
+    pairs = [(a + b) / 2 for a, b in zip(plain, mirrored)]
+    mean, half = confidence_interval(pairs, confidence)
+    independent = np.var(plain, ddof=1) / (2 * len(pairs))
+    paired = _variance_of_mean(pairs)
+    return mean, half, _reduction(independent, paired)
+
+
+def control_variates(values, controls, confidence=0.95):
+    """mean, half width and variance reduction from controls with mean zero
+
+    values holds one output per replication and controls one row of q
+    control observations per replication, each with known expectation 0
+    (for example a stream's exponential_mean() - 1). The output is
+    regressed on the controls and the fitted line is read off at zero.
+    """
+    y = np.asarray(values, dtype=float)
+    c = np.asarray(controls, dtype=float).reshape(len(y), -1)
+    n, q = c.shape
+    if n <= q + 1:
+        mean, half = confidence_interval(y.tolist(), confidence)
+        return mean, half, 1.0
+    design = np.column_stack([np.ones(n), c])
+    coef, *_ = np.linalg.lstsq(design, y, rcond=None)
+    residuals = y - design @ coef
+    s2 = residuals @ residuals / (n - q - 1)
+    # variance of the intercept, the controlled estimate of the mean
+    var = s2 * np.linalg.pinv(design.T @ design)[0, 0]
+    half = t_quantile(0.5 + confidence / 2, n - q - 1) * math.sqrt(var)
+    plain = _variance_of_mean(y)
+    return float(coef[0]), half, _reduction(plain, var)
+
+
+def common_random_numbers(first, second, independent_second, confidence=0.95):
+    """mean difference, half width and variance reduction from CRN
+
+    first[i] and second[i] ran on the same streams, independent_second on
+    streams of their own. The reduction compares the variance of the
+    paired differences with that of independent differences.
+    """
+    diffs = [b - a for a, b in zip(first, second)]
+    mean, half = confidence_interval(diffs, confidence)
+    independent = _variance_of_mean(first) + _variance_of_mean(independent_second)
+    paired = _variance_of_mean(diffs)
+    return mean, half, _reduction(independent, paired)
+
+
+def print_reduction(title, rows):
+    """rows of (measure, mean, half width, variance reduction factor)"""
+    print(f"=== {title} ===")
+    width = max(len(row[0]) for row in rows)
+    for name, mean, half, factor in rows:
+        print(f"{name:<{width}}  {mean:12.4f} +/- {half:10.4f}   variance reduction x{factor:6.2f}")